@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Security Advisory Join
+Version: 1.0.0
+Description: Loads an offline Ubuntu Security Notice feed (the USN database JSON
+or the per-release USN OVAL XML) into an index of fixed versions per
+(release, package), and reports which packages in parsed suites or in a
+query.py manifest are still below a fixed version.
+
+Fixed versions are kept sorted by their debversion sort key, so checking a
+version is one bisect: every advisory fixed above it is outstanding. Packages
+are grouped by (release, name) first and each distinct version is looked up
+once, so a full-archive scan costs one bisect per distinct version.
+
+Parsed packages are matched against the binary fixes of the advisories first
+(USN "binaries"/"allbinaries", OVAL tests); only packages without any are
+matched against the fixes of their source package.
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from datetime import datetime
+
+from debversion import sort_key
+from shards import read_json_list, read_shards
+
+SOURCE = "source"
+BINARY = "binary"
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+def series_of(suite):
+    """'jammy-security' -> 'jammy'; advisories are published per series."""
+    return suite.split("-", 1)[0]
+
+class AdvisoryIndex:
+    """Fixed versions per (kind, release, name), sorted for bisecting."""
+
+    def __init__(self):
+        self.advisories = {}  # id -> {"title", "cves", "published"}
+        self.pending = {SOURCE: {}, BINARY: {}}
+        self.fixed = {SOURCE: {}, BINARY: {}}  # (release, name) -> (keys, [(version, id)])
+
+    def add_advisory(self, advisory_id, title=None, cves=(), published=None):
+        self.advisories[advisory_id] = {"title": title, "cves": sorted(set(cves)), "published": published}
+
+    def add_fix(self, kind, release, name, version, advisory_id):
+        self.pending[kind].setdefault((release, name), []).append((version, advisory_id))
+
+    def finalize(self):
+        for kind, groups in self.pending.items():
+            for group, fixes in groups.items():
+                fixes = sorted(set(fixes), key=lambda fix: sort_key(fix[0]))
+                self.fixed[kind][group] = ([sort_key(version) for version, _ in fixes], fixes)
+        self.pending = {SOURCE: {}, BINARY: {}}
+        return self
+
+    def outstanding(self, kind, release, name, version):
+        """Advisories for (release, name) whose fixed version is above `version`."""
+        group = self.fixed[kind].get((release, name))
+        if not group:
+            return []
+        keys, fixes = group
+        return fixes[bisect_right(keys, sort_key(version)):]
+
+    def __len__(self):
+        return len(self.advisories)
+
+def load_usn_json(path, index):
+    """USN database JSON: {id: {"releases": {series: {"sources": {...}, "binaries": {...}}}, ...}}."""
+    with _open(path) as f:
+        data = json.load(f)
+    for key, notice in data.items():
+        advisory_id = notice.get("id", key)
+        if not advisory_id.startswith("USN-"):
+            advisory_id = f"USN-{advisory_id}"
+        index.add_advisory(advisory_id, notice.get("title"), notice.get("cves", []), notice.get("timestamp"))
+        for release, packages in notice.get("releases", {}).items():
+            for name, info in packages.get("sources", {}).items():
+                if info.get("version"):
+                    index.add_fix(SOURCE, release, name, info["version"], advisory_id)
+            binaries = {**packages.get("binaries", {}), **packages.get("allbinaries", {})}
+            for name, info in binaries.items():
+                if info.get("version"):
+                    index.add_fix(BINARY, release, name, info["version"], advisory_id)
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def load_oval(path, index, release=None):
+    """USN OVAL XML: dpkginfo tests pairing binary names with 'less than' EVR states."""
+    if release is None:
+        match = re.search(r"com\.ubuntu\.([a-z]+)\.", os.path.basename(path))
+        if not match:
+            raise ValueError(f"cannot tell the release of {path}; pass --release")
+        release = match.group(1)
+    with _open(path) as f:
+        root = ET.parse(f).getroot()
+
+    variables, objects, states, tests = {}, {}, {}, {}
+    for element in root.iter():
+        tag = _local(element.tag)
+        if tag == "constant_variable":
+            variables[element.get("id")] = [value.text for value in element if value.text]
+        elif tag == "dpkginfo_object":
+            for child in element:
+                if _local(child.tag) == "name":
+                    objects[element.get("id")] = (child.get("var_ref"), child.text)
+        elif tag == "dpkginfo_state":
+            for child in element:
+                if _local(child.tag) == "evr" and child.get("operation", "less than") == "less than":
+                    states[element.get("id")] = child.text
+        elif tag == "dpkginfo_test":
+            refs = {_local(child.tag): child.get("object_ref") or child.get("state_ref") for child in element}
+            tests[element.get("id")] = (refs.get("object"), refs.get("state"))
+
+    for definition in root.iter():
+        if _local(definition.tag) != "definition":
+            continue
+        advisory_id = definition.get("id")
+        title, cves = None, []
+        test_refs = []
+        for element in definition.iter():
+            tag = _local(element.tag)
+            if tag == "title":
+                title = element.text
+            elif tag == "reference":
+                if element.get("source") == "USN":
+                    advisory_id = element.get("ref_id")
+                elif element.get("source") == "CVE":
+                    cves.append(element.get("ref_id"))
+            elif tag == "criterion":
+                test_refs.append(element.get("test_ref"))
+        index.add_advisory(advisory_id, title, cves)
+        for test_ref in test_refs:
+            object_ref, state_ref = tests.get(test_ref, (None, None))
+            version = states.get(state_ref)
+            if object_ref not in objects or not version:
+                continue
+            var_ref, name = objects[object_ref]
+            for binary in variables.get(var_ref, [name] if name else []):
+                index.add_fix(BINARY, release, binary, version, advisory_id)
+
+def load_feeds(paths, release=None):
+    index = AdvisoryIndex()
+    for path in paths:
+        if ".xml" in os.path.basename(path):
+            load_oval(path, index, release)
+        else:
+            load_usn_json(path, index)
+    return index.finalize()
+
+def load_packages(path):
+    """parser.py output: a JSON list (streamed item by item), or a --jsonl-dir shard directory."""
+    if os.path.isdir(path):
+        return read_shards(path)
+    return read_json_list(path)
+
+def load_manifest(path):
+    """query.py manifest: 'package[:arch]<TAB>version' lines; snaps are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split("\t")
+            if len(parts) != 2 or parts[0].startswith("snap:"):
+                continue
+            name, _, arch = parts[0].partition(":")
+            yield {"package": name, "version": parts[1], "architecture": arch or None}
+
+def full_version(row):
+    """The row's version with its epoch; parser.py output keeps the epoch in its own field."""
+    return f"{row['epoch']}:{row['version']}" if row.get("epoch") else row["version"]
+
+def join(index, rows, release_of, matches):
+    """
+    Report rows below a fixed version. `matches` is a list of (kind, name_of)
+    tried in order; a row is checked against the first that has fixes for it.
+    Rows are grouped by (kind, release, name) and each distinct version is
+    bisected once against the group's fixed versions.
+    """
+    groups = {}
+    for row in rows:
+        if not row.get("version"):
+            continue
+        release = release_of(row)
+        for kind, name_of in matches:
+            name = name_of(row)
+            if (release, name) in index.fixed[kind]:
+                groups.setdefault((kind, release, name), {}).setdefault(full_version(row), []).append(row)
+                break
+
+    findings = []
+    for (kind, release, name), versions in groups.items():
+        for version, members in versions.items():
+            pending = index.outstanding(kind, release, name, version)
+            if not pending:
+                continue
+            ids = [advisory_id for _, advisory_id in pending]
+            cves = sorted({cve for advisory_id in ids for cve in index.advisories.get(advisory_id, {}).get("cves", [])})
+            for row in members:
+                findings.append({
+                    "suite": row.get("release", release),
+                    "package": row["package"],
+                    "source": row.get("source", name) if kind == SOURCE else row.get("source"),
+                    "architecture": row.get("architecture"),
+                    "version": version,
+                    "fixed_version": pending[-1][0],
+                    "matched": kind,
+                    "advisories": ids,
+                    "cves": cves
+                })
+    findings.sort(key=lambda f: (f["suite"], f["package"], f["architecture"] or ""))
+    return findings
+
+def summarize(findings):
+    summary = {}
+    for finding in findings:
+        suite = summary.setdefault(finding["suite"], {"packages": 0, "advisories": set()})
+        suite["packages"] += 1
+        suite["advisories"].update(finding["advisories"])
+    return {suite: {"packages": s["packages"], "advisories": len(s["advisories"])} for suite, s in summary.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report packages below the fixed version of Ubuntu Security Notices')
+    parser.add_argument('-f', '--feed', action='append', required=True,
+                        help='USN database JSON (.json[.gz|.bz2]) or USN OVAL XML (.xml[.bz2]); may be repeated')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('-p', '--packages', help='Parsed packages JSON or --jsonl-dir shard directory (parser.py output)')
+    target.add_argument('-m', '--manifest', help='query.py manifest file (package<TAB>version lines)')
+    parser.add_argument('-r', '--release', help='Release (series) of the manifest, and of OVAL feeds whose filename does not name one')
+    parser.add_argument('-o', '--output', default='advisory_report.json', help='Output report JSON file')
+    args = parser.parse_args(argv)
+
+    if args.manifest and not args.release:
+        parser.error("--manifest requires --release")
+
+    index = load_feeds(args.feed, args.release)
+    print(f"Loaded {len(index)} advisories from {len(args.feed)} feed(s)")
+
+    if args.packages:
+        # Binary fixes carry the binary's own version; the source fix is only a fallback
+        findings = join(index, load_packages(args.packages), lambda row: series_of(row.get("release", "")),
+                        [(BINARY, lambda row: row["package"]),
+                         (SOURCE, lambda row: row.get("source") or row["package"])])
+    else:
+        manifest = os.path.basename(args.manifest)
+        rows = ({**row, "release": manifest} for row in load_manifest(args.manifest))
+        findings = join(index, rows, lambda row: args.release, [(BINARY, lambda row: row["package"])])
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "feeds": args.feed,
+        "summary": summarize(findings),
+        "findings": findings
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(findings)} packages below a fixed version; report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Package Query API
+Version: 1.0.0
+Description: Serves parsed package, size and change data over a local HTTP API
+with indexed lookups, prefix search, pagination and gzip-compressed responses.
+
+Endpoints:
+  GET /packages?package=&source=&release=&component=&arch=&prefix=&offset=&limit=
+  GET /packages/<package>
+  GET /sources/<source>
+  GET /search?prefix=&limit=
+  GET /sizes?release=&component=&arch=
+  GET /changes?release=&component=&arch=&package=
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from dbexport import load_packages
+from records import PackageTable
+
+SCRIPT_VERSION = "1.0.0"
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+CACHE_BYTES = 64 << 20  # encoded responses kept per store
+
+def log(msg, verbose=False):
+    if verbose:
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
+
+def load_json(path):
+    if not path:
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _column_index(ids):
+    """Map each pool id of a categorical column to the rows that carry it."""
+    index = {}
+    for row, idx in enumerate(ids):
+        index.setdefault(idx, array("I")).append(row)
+    return index
+
+class ResponseCache:
+    """LRU of encoded query responses, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()  # handler threads share the store
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        body = value[0]
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self.entries[key] = value
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+class PackageStore:
+    """In-memory package table plus the lookup indexes the API serves from."""
+
+    def __init__(self, table, sizes=None, changes=None):
+        self.table = table
+        self.sizes = sizes or {}
+        self.changes = changes or {}
+        self.cache = ResponseCache()
+
+        self.by_package = {}
+        for row, name in enumerate(table.packages):
+            self.by_package.setdefault(name, array("I")).append(row)
+        self.package_names = sorted(self.by_package)
+        self.by_source = _column_index(table.source_ids)
+        self.by_release = _column_index(table.release_ids)
+        self.by_component = _column_index(table.component_ids)
+        self.by_arch = _column_index(table.architecture_ids)
+        self.deleted = set()  # rows removed by apply_delta; the column indexes still list them
+
+        # package name -> [(release, component, arch, kind)] from the tracker report
+        self.changes_by_package = {}
+        for release, components in self.changes.items():
+            for component, arches in components.items():
+                for arch, report in arches.items():
+                    for kind in ("new_packages", "removed_packages"):
+                        for name in report.get(kind, []):
+                            self.changes_by_package.setdefault(name, []).append((release, component, arch, kind))
+                    for name in report.get("version_changes", {}):
+                        self.changes_by_package.setdefault(name, []).append((release, component, arch, "version_changes"))
+
+    def prefix_search(self, prefix, limit=DEFAULT_LIMIT):
+        start = bisect.bisect_left(self.package_names, prefix)
+        names = []
+        for name in self.package_names[start:]:
+            if not name.startswith(prefix) or len(names) >= limit:
+                break
+            names.append(name)
+        return names
+
+    def _rows_for_prefix(self, prefix):
+        start = bisect.bisect_left(self.package_names, prefix)
+        rows = array("I")
+        for name in self.package_names[start:]:
+            if not name.startswith(prefix):
+                break
+            rows.extend(self.by_package[name])
+        return sorted(rows)
+
+    def find_rows(self, package=None, source=None, release=None, component=None, arch=None, prefix=None):
+        """Intersect the per-column indexes, starting from the most selective one."""
+        table = self.table
+        candidates = []
+        filters = []
+        if package is not None:
+            candidates.append(self.by_package.get(package, array("I")))
+        if prefix is not None:
+            candidates.append(self._rows_for_prefix(prefix))
+        for value, pool, index, ids in ((source, table.sources, self.by_source, table.source_ids),
+                                        (release, table.releases, self.by_release, table.release_ids),
+                                        (component, table.components, self.by_component, table.component_ids),
+                                        (arch, table.architectures, self.by_arch, table.architecture_ids)):
+            if value is None:
+                continue
+            idx = pool.ids.get(value)
+            if idx is None:
+                return []
+            candidates.append(index.get(idx, array("I")))
+            filters.append((ids, idx))
+
+        if not candidates:
+            return [row for row in range(len(table)) if row not in self.deleted] if self.deleted else range(len(table))
+        rows = min(candidates, key=len)
+        if package is not None and rows is not candidates[0]:
+            filters.append((table.packages, package))
+        if prefix is not None:
+            rows = [row for row in rows if table.packages[row].startswith(prefix)]
+        return [row for row in rows if all(ids[row] == idx for ids, idx in filters) and row not in self.deleted]
+
+    def _find_row(self, package, version, release, component, arch):
+        table = self.table
+        for row in self.by_package.get(package, ()):
+            record = table[row]
+            if (record.full_version, record.release, record.component, record.architecture) == (version, release, component, arch):
+                return row
+        return None
+
+    def _unindex(self, index, key, row):
+        rows = index.get(key)
+        if rows is not None and row in rows:
+            rows.remove(row)
+
+    def apply_delta(self, delta):
+        """
+        Update the table and its indexes from one delta.py delta: changed rows are
+        rewritten in place, new rows appended and removed rows marked deleted.
+        """
+        if delta["kind"] != "packages":
+            return
+        table = self.table
+        release, component = delta["release"], delta["component"]
+        for record in delta["removed"]:
+            row = self._find_row(record["package"], record["version"], release, component, record["architecture"])
+            if row is None:
+                continue
+            self.deleted.add(row)
+            self._unindex(self.by_package, record["package"], row)
+            self._unindex(self.by_source, table.source_ids[row], row)
+            if not self.by_package[record["package"]]:
+                del self.by_package[record["package"]]
+                del self.package_names[bisect.bisect_left(self.package_names, record["package"])]
+
+        for old, record in [(None, record) for record in delta["added"]] + delta["changed"]:
+            # A changed row is found by its old version; an added one is new unless an
+            # initial delta meets rows that were already loaded
+            if old is not None:
+                candidates = (old, record)
+            else:
+                candidates = (record,) if delta["initial"] else ()
+            row = None
+            for candidate in candidates:
+                if row is None:
+                    row = self._find_row(candidate["package"], candidate["version"], release, component,
+                                         candidate["architecture"])
+            source_id = table.sources.intern(record["source"] or record["package"])
+            if row is None:
+                table.append(release, component, record["package"], record["version"], record["source"],
+                             record["section"], record["maintainer"], record["size"], record["architecture"])
+                row = len(table) - 1
+                if record["package"] not in self.by_package:
+                    bisect.insort(self.package_names, record["package"])
+                self.by_package.setdefault(record["package"], array("I")).append(row)
+                for index, ids in ((self.by_source, table.source_ids), (self.by_release, table.release_ids),
+                                   (self.by_component, table.component_ids), (self.by_arch, table.architecture_ids)):
+                    index.setdefault(ids[row], array("I")).append(row)
+                continue
+            if table.source_ids[row] != source_id:
+                self._unindex(self.by_source, table.source_ids[row], row)
+                rows = self.by_source.setdefault(source_id, array("I"))
+                rows.insert(bisect.bisect_left(rows, row), row)
+            table.versions[row] = record["version"]
+            table.source_ids[row] = source_id
+            table.section_ids[row] = table.sections.intern(record["section"])
+            table.maintainer_ids[row] = table.maintainers.intern(record["maintainer"])
+            table.sizes[row] = -1 if record["size"] is None else record["size"]
+
+        self.cache.clear()
+
+    def response(self, query, args, accept_gzip=False):
+        """(body, gzipped) of a query_* method's JSON answer, served from the cache when possible."""
+        key = (query, args, accept_gzip)
+        cached = self.cache.get(key)
+        if cached is None:
+            body = json.dumps(getattr(self, query)(*args), separators=(",", ":")).encode("utf-8")
+            gzipped = accept_gzip and len(body) > 512
+            cached = (gzip.compress(body, compresslevel=5) if gzipped else body, gzipped)
+            self.cache.put(key, cached)
+        return cached
+
+    def query_packages(self, package=None, source=None, release=None, component=None, arch=None,
+                       prefix=None, offset=0, limit=DEFAULT_LIMIT):
+        rows = self.find_rows(package, source, release, component, arch, prefix)
+        page = rows[offset:offset + limit]
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "results": [self.table[row].to_dict() for row in page]
+        }
+
+    def query_sizes(self, release=None, component=None, arch=None):
+        result = {}
+        for rel, components in self.sizes.items():
+            if release is not None and rel != release:
+                continue
+            for comp, arches in components.items():
+                if component is not None and comp != component:
+                    continue
+                for arch_name, stats in arches.items():
+                    if arch is not None and arch_name not in (arch, f"binary-{arch}"):
+                        continue
+                    result.setdefault(rel, {}).setdefault(comp, {})[arch_name] = stats
+        return result
+
+    def query_changes(self, release=None, component=None, arch=None, package=None):
+        if package is not None:
+            hits = [{"release": rel, "component": comp, "architecture": arch_name, "change": kind}
+                    for rel, comp, arch_name, kind in self.changes_by_package.get(package, [])
+                    if release in (None, rel) and component in (None, comp)
+                    and arch in (None, arch_name, arch_name.replace("binary-", ""))]
+            return {"package": package, "changes": hits}
+        result = {}
+        for rel, components in self.changes.items():
+            if release is not None and rel != release:
+                continue
+            for comp, arches in components.items():
+                if component is not None and comp != component:
+                    continue
+                for arch_name, report in arches.items():
+                    if arch is not None and arch_name not in (arch, f"binary-{arch}"):
+                        continue
+                    result.setdefault(rel, {}).setdefault(comp, {})[arch_name] = report
+        return result
+
+class APIHandler(BaseHTTPRequestHandler):
+    store = None
+    verbose = False
+    server_version = f"copr-api/{SCRIPT_VERSION}"
+
+    def log_message(self, format, *args):
+        log(format % args, self.verbose)
+
+    def accepts_gzip(self):
+        return "gzip" in self.headers.get("Accept-Encoding", "")
+
+    def send_body(self, body, gzipped=False, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        gzipped = self.accepts_gzip() and len(body) > 512
+        self.send_body(gzip.compress(body, compresslevel=5) if gzipped else body, gzipped, status)
+
+    def send_query(self, query, *args):
+        self.send_body(*self.store.response(query, args, self.accepts_gzip()))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        try:
+            offset = max(0, int(params.pop("offset", 0)))
+            limit = min(MAX_LIMIT, max(1, int(params.pop("limit", DEFAULT_LIMIT))))
+        except ValueError:
+            self.send_json({"error": "offset and limit must be integers"}, 400)
+            return
+        filters = {key: params.get(key) for key in ("package", "source", "release", "component", "arch", "prefix")}
+        if len(parts) == 2 and parts[0] in ("packages", "sources"):
+            filters["package" if parts[0] == "packages" else "source"] = parts[1]
+
+        if parts == ["packages"] or (len(parts) == 2 and parts[0] in ("packages", "sources")):
+            self.send_query("query_packages", *filters.values(), offset, limit)
+        elif parts == ["search"]:
+            self.send_json({"results": self.store.prefix_search(params.get("prefix", ""), limit)})
+        elif parts == ["sizes"]:
+            self.send_query("query_sizes", filters["release"], filters["component"], filters["arch"])
+        elif parts == ["changes"]:
+            self.send_query("query_changes", filters["release"], filters["component"], filters["arch"], filters["package"])
+        else:
+            self.send_json({"error": f"Unknown endpoint: {url.path}"}, 404)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ubuntu Package Query API')
+    parser.add_argument('-p', '--packages', required=True, help='Parsed packages (parser.py output: JSON list, streamed record by record, or --jsonl-dir shard directory)')
+    parser.add_argument('-s', '--sizes', help='Path to repository size JSON (sizer.py output)')
+    parser.add_argument('-c', '--changes', help='Path to change report JSON (tracker.py output)')
+    parser.add_argument('-d', '--deltas', help='Delta feed (delta.py output) to apply on top of --packages and --sizes; both must predate the feed')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose mode')
+    args = parser.parse_args(argv)
+
+    table = PackageTable.from_dicts(load_packages(args.packages))
+    APIHandler.store = PackageStore(table, load_json(args.sizes), load_json(args.changes))
+    if args.deltas:
+        from delta import read_feed
+        from sizer import apply_delta
+        for delta in read_feed(args.deltas):
+            APIHandler.store.apply_delta(delta)
+            if args.sizes:
+                apply_delta(APIHandler.store.sizes, delta)
+    APIHandler.verbose = args.verbose
+
+    server = ThreadingHTTPServer((args.host, args.port), APIHandler)
+    print(f"✅ Serving {len(table) - len(APIHandler.store.deleted)} packages on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
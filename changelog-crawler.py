@@ -5,6 +5,8 @@ Version: 1.0
 
 This script crawls the Ubuntu changelog repository directories under:
   https://changelogs.ubuntu.com/changelogs/pool/
+or, with --tree binary, under:
+  https://changelogs.ubuntu.com/changelogs/binary/<prefix>/<package>/<version>/
 
 It recursively searches the four main components (main, universe, multiverse, restricted)
 for files named "copyright" and "changelog". From each package directory, it extracts:
@@ -13,27 +15,40 @@ for files named "copyright" and "changelog". From each package directory, it ext
   - copyright_url (full URL to the copyright file)
   - changelog_url (full URL to the changelog file)
 
-The collected data is written to packages.json.
+The collected data is written to packages.json, or streamed as gzip JSON Lines
+shards per component/prefix (plus manifest.json) with --jsonl-dir.
+
+The binary tree is sharded by its alphanumeric prefix directories: shards are
+crawled by concurrent worker tasks (optionally spread over processes) and each
+is written to <output-dir>/<prefix>.json as soon as it finishes, so single
+shards can be refreshed with --prefix. A shard whose listings could not all be
+fetched is reported as failed and its previous file is left untouched.
   
 Usage:
-    python3 changelog_crawler_v1.0.py
+    python3 changelog_crawler_v1.0.py [-o packages.json] [--jsonl-dir DIR]
+    python3 changelog_crawler_v1.0.py --tree binary [--output-dir DIR] [-w 8] [-p 4] [--prefix libc ...]
 """
 
+import argparse
 import asyncio
-import aiohttp
+import sys
 import time
 import os
 import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 import json
+from httpclient import INITIAL_CONCURRENCY, MAX_CONCURRENCY, MIN_CONCURRENCY, AsyncHttpClient, Controller, format_metrics
+from shards import ShardedWriter
 
 # Global state for tracking visited URLs and package data.
 visited = set()
 packages = {}  # key: unique package identifier, value: package info dictionary
 hits_count = 0
+writer = None  # ShardedWriter when streaming JSON Lines shards
 
-# Limit concurrent HTTP requests.
-semaphore = asyncio.Semaphore(10)
+POOL_BASE = "https://changelogs.ubuntu.com/changelogs/pool/"
+BINARY_BASE = "https://changelogs.ubuntu.com/changelogs/binary/"
 
 def update_package(url, file_type):
     """
@@ -46,10 +61,10 @@ def update_package(url, file_type):
     try:
         pool_index = parts.index("pool")
     except ValueError:
-        return
+        return None
 
     if len(parts) < pool_index + 6:
-        return
+        return None
 
     component = parts[pool_index + 1]
     alphanum = parts[pool_index + 2]
@@ -73,8 +88,14 @@ def update_package(url, file_type):
         packages[key]["copyright_url"] = url
     elif file_type == "changelog":
         packages[key]["changelog_url"] = url
+    return key
 
-async def crawl(url, session, allowed_base):
+def emit_package(key):
+    """Stream a finished package directory to its shard and release it from memory."""
+    component, alphanum = key.split("/")[:2]
+    writer.write(packages.pop(key), key=(component, alphanum))
+
+async def crawl(url, client, allowed_base):
     global hits_count
     if not url.endswith('/'):
         url += '/'
@@ -84,23 +105,23 @@ async def crawl(url, session, allowed_base):
         return
     visited.add(url)
     
-    async with semaphore:
-        try:
-            start = time.monotonic()
-            async with session.get(url) as response:
-                hits_count += 1
-                if response.status != 200:
-                    print(f"Skipping {url}: status code {response.status}")
-                    return
-                text = await response.text()
-            elapsed = time.monotonic() - start
-            print(f"Fetched {url} in {elapsed:.2f} seconds")
-        except Exception as e:
-            print(f"Failed to fetch {url}: {e}")
+    # The client limits concurrent requests per host and retries throttled ones
+    try:
+        start = time.monotonic()
+        status, text = await client.get_text(url)
+        hits_count += 1
+        if status != 200:
+            print(f"Skipping {url}: status code {status}")
             return
+        elapsed = time.monotonic() - start
+        print(f"Fetched {url} in {elapsed:.2f} seconds")
+    except Exception as e:
+        print(f"Failed to fetch {url}: {e}")
+        return
 
     soup = BeautifulSoup(text, "html.parser")
     tasks = []
+    found_keys = set()
     for a in soup.find_all("a"):
         href = a.get("href")
         if not href:
@@ -112,33 +133,199 @@ async def crawl(url, session, allowed_base):
         if not full_url.startswith(allowed_base):
             continue
         if href.endswith("/"):
-            tasks.append(crawl(full_url, session, allowed_base))
+            tasks.append(crawl(full_url, client, allowed_base))
         else:
             filename = os.path.basename(urllib.parse.urlparse(full_url).path).lower()
             if filename in ("copyright", "changelog"):
-                update_package(full_url, filename)
+                key = update_package(full_url, filename)
+                if key:
+                    found_keys.add(key)
                 print(f"Found {filename}: {full_url}")
+    # A version directory listing holds all of its files, so the package is complete
+    if writer is not None:
+        for key in found_keys:
+            emit_package(key)
     if tasks:
         await asyncio.gather(*tasks)
 
-async def main():
-    base_components = [
-        "https://changelogs.ubuntu.com/changelogs/pool/main/",
-        "https://changelogs.ubuntu.com/changelogs/pool/universe/",
-        "https://changelogs.ubuntu.com/changelogs/pool/multiverse/",
-        "https://changelogs.ubuntu.com/changelogs/pool/restricted/"
-    ]
-    async with aiohttp.ClientSession() as session:
-        tasks = [crawl(base, session, base) for base in base_components]
+class ListingError(Exception):
+    """A directory listing could not be fetched, so whatever is built from it is incomplete."""
+
+def _first_error(results):
+    """Raise the first exception of a gather(..., return_exceptions=True), else return the results."""
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+async def list_dir(client, url):
+    """Return the (subdirectory names, file names) of a directory listing; raises ListingError."""
+    global hits_count
+    try:
+        status, text = await client.get_text(url)
+        hits_count += 1
+    except Exception as e:
+        raise ListingError(f"Failed to fetch {url}: {e}") from e
+    if status != 200:
+        raise ListingError(f"Failed to fetch {url}: status code {status}")
+    dirs, files = [], []
+    for a in BeautifulSoup(text, "html.parser").find_all("a"):
+        href = a.get("href")
+        if not href or a.text.strip() == "Parent Directory" or href.startswith(("?", "/", "../")) or "://" in href:
+            continue
+        if href.endswith("/"):
+            dirs.append(urllib.parse.unquote(href[:-1]))
+        else:
+            files.append(urllib.parse.unquote(href))
+    return dirs, files
+
+async def crawl_binary_package(client, package_url, package):
+    """One binary package: list its version directories, then their files."""
+    versions, _ = await list_dir(client, package_url)
+    listings = _first_error(await asyncio.gather(
+        *(list_dir(client, f"{package_url}{urllib.parse.quote(v)}/") for v in versions), return_exceptions=True))
+    records = []
+    for version, (_, files) in zip(versions, listings):
+        names = {name.lower() for name in files}
+        if not names & {"copyright", "changelog"}:
+            continue
+        version_url = f"{package_url}{urllib.parse.quote(version)}/"
+        records.append({
+            "package": package,
+            "version": version,
+            "copyright_url": f"{version_url}copyright" if "copyright" in names else None,
+            "changelog_url": f"{version_url}changelog" if "changelog" in names else None
+        })
+    return records
+
+def write_shard(output_dir, prefix, records):
+    """Atomically replace <output_dir>/<prefix>.json with the shard's records."""
+    path = os.path.join(output_dir, f"{prefix}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(sorted(records, key=lambda r: (r["package"], r["version"])), f, indent=2)
+    os.replace(path + ".tmp", path)
+
+async def crawl_binary_shard(client, prefix, output_dir):
+    """Crawl one prefix shard and write it; returns its record count, or None if a listing failed."""
+    prefix_url = f"{BINARY_BASE}{urllib.parse.quote(prefix)}/"
+    try:
+        package_names, _ = await list_dir(client, prefix_url)
+        results = _first_error(await asyncio.gather(
+            *(crawl_binary_package(client, f"{prefix_url}{urllib.parse.quote(name)}/", name) for name in package_names),
+            return_exceptions=True))
+    except ListingError as e:
+        # A partial shard would replace a complete one; keep the previous file instead
+        print(f"Shard {prefix} failed, previous {prefix}.json kept: {e}")
+        return None
+    records = [record for result in results for record in result]
+    write_shard(output_dir, prefix, records)
+    print(f"Shard {prefix}: {len(records)} package versions from {len(package_names)} packages")
+    return len(records)
+
+def process_controller(processes):
+    """
+    Per-host limits for one of `processes` crawling processes. Each process has its
+    own controller, so the limits are split between them to keep the total per
+    host where a single process would put it.
+    """
+    share = max(1, processes)
+    return Controller(initial=max(MIN_CONCURRENCY, INITIAL_CONCURRENCY // share), minimum=MIN_CONCURRENCY,
+                      maximum=max(MIN_CONCURRENCY, MAX_CONCURRENCY // share))
+
+async def crawl_binary_shards(prefixes, output_dir, workers, processes=1):
+    """Crawl the given prefix shards with `workers` concurrent shard tasks."""
+    queue = asyncio.Queue()
+    for prefix in prefixes:
+        queue.put_nowait(prefix)
+    counts = {}
+
+    async def worker(client):
+        while not queue.empty():
+            prefix = queue.get_nowait()
+            counts[prefix] = await crawl_binary_shard(client, prefix, output_dir)
+
+    async with AsyncHttpClient(process_controller(processes)) as client:
+        await asyncio.gather(*(worker(client) for _ in range(max(1, workers))))
+    return counts, hits_count, client.metrics()
+
+def _reset_hits():
+    global hits_count
+    hits_count = 0  # forked workers start with the parent's count
+
+def run_binary_shards(prefixes, output_dir, workers, processes=1):
+    """Process pool entry point: crawl a subset of the shards in its own event loop."""
+    return asyncio.run(crawl_binary_shards(prefixes, output_dir, workers, processes))
+
+async def list_prefixes():
+    async with AsyncHttpClient() as client:
+        prefixes, _ = await list_dir(client, BINARY_BASE)
+    return prefixes
+
+def crawl_binary_tree(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    prefixes = args.prefix or asyncio.run(list_prefixes())
+    start = time.monotonic()
+    if args.processes and args.processes > 1 and len(prefixes) > 1:
+        # Deal the shards round-robin; each process paces its own share of the per-host limit
+        groups = [prefixes[i::args.processes] for i in range(args.processes)]
+        with ProcessPoolExecutor(max_workers=args.processes, initializer=_reset_hits) as executor:
+            results = list(executor.map(run_binary_shards, groups, [args.output_dir] * len(groups),
+                                        [args.workers] * len(groups), [len(groups)] * len(groups)))
+    else:
+        results = [run_binary_shards(prefixes, args.output_dir, args.workers)]
+
+    total = sum(count for counts, _, _ in results for count in counts.values() if count is not None)
+    failed = sorted(prefix for counts, _, _ in results for prefix, count in counts.items() if count is None)
+    hits = sum(hits for _, hits, _ in results)
+    print(f"\nCrawled {len(prefixes)} shards in {time.monotonic() - start:.1f} seconds.")
+    print(f"Total HTTP hits: {hits}")
+    for _, _, metrics in results:
+        print(format_metrics(metrics))
+    print(f"{total} package versions written to {args.output_dir}")
+    if failed:
+        print(f"{len(failed)} shards failed and were not written; retry with: " + " ".join(f"--prefix {p}" for p in failed))
+    return failed
+
+async def crawl_pool_tree(args):
+    global writer
+    if args.jsonl_dir:
+        writer = ShardedWriter(args.jsonl_dir, key_fields=("component", "prefix"),
+                               metadata={"generator": "changelog-crawler.py"})
+
+    base_components = [f"{POOL_BASE}{component}/" for component in ("main", "universe", "multiverse", "restricted")]
+    async with AsyncHttpClient() as client:
+        tasks = [crawl(base, client, base) for base in base_components]
         await asyncio.gather(*tasks)
     print("\nCrawling complete.")
     print(f"Total HTTP hits: {hits_count}")
+    print(format_metrics(client.metrics()))
+    if writer is not None:
+        for key in list(packages):
+            emit_package(key)
+        manifest = writer.close()
+        print(f"{manifest['total_count']} packages written to {len(manifest['shards'])} shards in {args.jsonl_dir}")
+        return
     result = list(packages.values())
     # Write output to packages.json
-    with open("packages.json", "w") as f:
+    with open(args.output, "w") as f:
         json.dump(result, f, indent=2)
-    print("Output written to packages.json")
+    print(f"Output written to {args.output}")
 
-if __name__ == '__main__':
-    asyncio.run(main())
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl changelogs.ubuntu.com for copyright and changelog URLs')
+    parser.add_argument('--tree', choices=['pool', 'binary'], default='pool', help='Changelog tree to crawl')
+    parser.add_argument('-o', '--output', default='packages.json', help='Output JSON filename (pool tree)')
+    parser.add_argument('--jsonl-dir', help='Stream gzip JSON Lines shards per component/prefix plus a manifest to this directory (pool tree)')
+    parser.add_argument('--output-dir', default='binary_changelogs', help='Directory for the per-prefix shard files (binary tree)')
+    parser.add_argument('--prefix', action='append', help='Only crawl (refresh) this prefix shard, e.g. a or libc; may be repeated (binary tree)')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='Shards crawled concurrently per process (binary tree)')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Spread the shards over this many processes, which split the per-host connection limit (binary tree)')
+    args = parser.parse_args(argv)
 
+    if args.tree == 'binary':
+        return 1 if crawl_binary_tree(args) else 0
+    asyncio.run(crawl_pool_tree(args))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Changelog Indexer
+Version: 1.0.0
+Description: Downloads the changelogs catalogued by changelog-crawler.py or
+parser.py, parses them into entries (version, distribution, urgency, date,
+maintainer, text) and keeps an on-disk inverted index in SQLite for full-text
+and CVE lookups across all releases.
+
+Fetching is incremental: every changelog URL already in the database with a
+final status (200, or 404/410 for a changelog that is gone) is skipped, and since a changelog repeats all older entries, each
+(package, version) entry is stored and indexed only once.
+
+Usage:
+    python3 changelogs.py fetch -d changelogs.sqlite3 -i packages.json -i binary_changelogs/
+    python3 changelogs.py search -d changelogs.sqlite3 openssl heap overflow
+    python3 changelogs.py cve -d changelogs.sqlite3 CVE-2024-12345
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sqlite3
+import time
+from email.utils import parsedate_to_datetime
+
+from httpclient import AsyncHttpClient, format_metrics
+from shards import MANIFEST, read_shards
+
+BATCH_SIZE = 256  # changelogs fetched and committed together; an interrupted run resumes after the last batch
+FINAL_STATUSES = (200, 404, 410)  # anything else (a 5xx still failing after retries, 403, ...) is fetched again next run
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL,
+    package TEXT NOT NULL,
+    version TEXT,
+    status INTEGER,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER REFERENCES documents(id),
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    distribution TEXT,
+    urgency TEXT,
+    date TEXT,
+    maintainer TEXT,
+    text TEXT,
+    UNIQUE (package, version)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    PRIMARY KEY (term, entry_id)
+) WITHOUT ROWID;
+"""
+
+_HEADER = re.compile(r"^(\S+) \(([^)]+)\) ([^;]*);(.*)$")
+_TRAILER = re.compile(r"^ -- (.*?) <[^>]*>\s+(.+)$")
+_URGENCY = re.compile(r"urgency=(\w+)", re.IGNORECASE)
+_TOKEN = re.compile(r"cve-\d{4}-\d{4,}|[a-z0-9][a-z0-9.+_-]*[a-z0-9]", re.IGNORECASE)
+
+def tokenize(text):
+    """Distinct lowercase terms; CVE ids stay whole ('cve-2024-1234')."""
+    return {token.lower() for token in _TOKEN.findall(text) if len(token) <= 64}
+
+def parse_changelog(text):
+    """Yield one dict per entry of a debian/changelog."""
+    entry = None
+    body = []
+    for line in text.splitlines():
+        header = _HEADER.match(line)
+        if header:
+            entry = {"package": header.group(1), "version": header.group(2),
+                     "distribution": header.group(3).strip(), "date": None, "maintainer": None}
+            urgency = _URGENCY.search(header.group(4))
+            entry["urgency"] = urgency.group(1).lower() if urgency else None
+            body = []
+            continue
+        if entry is None:
+            continue
+        trailer = _TRAILER.match(line)
+        if trailer:
+            entry["maintainer"] = trailer.group(1).strip()
+            try:
+                entry["date"] = parsedate_to_datetime(trailer.group(2).strip()).isoformat()
+            except (TypeError, ValueError):
+                entry["date"] = trailer.group(2).strip()
+            entry["text"] = "\n".join(body).strip("\n")
+            yield entry
+            entry = None
+        else:
+            body.append(line)
+
+def _records(path):
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            yield from read_shards(path)
+            return
+        for name in sorted(glob.glob(os.path.join(path, "*.json"))):
+            yield from _records(name)
+        return
+    with open(path, "r") as f:
+        data = json.load(f)
+    yield from data.get("packages", []) if isinstance(data, dict) else data
+
+def changelog_urls(paths):
+    """
+    (url, package, version) for every distinct changelog in crawler output,
+    binary-tree shard directories, parser.py output or --jsonl-dir shards.
+    """
+    seen = set()
+    for path in paths:
+        for record in _records(path):
+            url = record.get("changelog_url") or record.get("changelog")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            # parser.py records point at the source package's changelog
+            yield url, record.get("source") or record.get("package"), record.get("version")
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.executescript(SCHEMA)
+    return db
+
+def store(db, url, package, version, status, text):
+    """Record one fetched changelog and index the entries not stored before."""
+    cursor = db.execute("INSERT OR REPLACE INTO documents (url, package, version, status, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                        (url, package, version, status, time.time()))
+    document_id = cursor.lastrowid
+    added = 0
+    for entry in parse_changelog(text or ""):
+        cursor = db.execute(
+            "INSERT OR IGNORE INTO entries (document_id, package, version, distribution, urgency, date, maintainer, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (document_id, entry["package"], entry["version"], entry["distribution"], entry["urgency"],
+             entry["date"], entry["maintainer"], entry["text"]))
+        if not cursor.rowcount:
+            continue  # already indexed from another version's changelog
+        added += 1
+        terms = tokenize(f"{entry['package']} {entry['distribution']} {entry['text']}")
+        db.executemany("INSERT OR IGNORE INTO terms (term, entry_id) VALUES (?, ?)",
+                       ((term, cursor.lastrowid) for term in terms))
+    return added
+
+async def fetch_all(db, pending, verbose=False):
+    fetched = entries = 0
+    async with AsyncHttpClient() as client:
+        async def fetch(url):
+            try:
+                return await client.get_text(url)
+            except Exception as e:
+                if verbose:
+                    print(f"Failed to fetch {url}: {e}")
+                return None, None
+
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch = pending[start:start + BATCH_SIZE]
+            results = await asyncio.gather(*(fetch(url) for url, _, _ in batch))
+            with db:
+                for (url, package, version), (status, text) in zip(batch, results):
+                    if status not in FINAL_STATUSES:
+                        if verbose and status is not None:
+                            print(f"Failed to fetch {url}: status code {status}")
+                        continue  # left unseen so the next run retries it
+                    fetched += 1
+                    entries += store(db, url, package, version, status, text if status == 200 else None)
+            print(f"Fetched {min(start + BATCH_SIZE, len(pending))}/{len(pending)} changelogs, {entries} new entries", end="\r")
+    print()
+    print(format_metrics(client.metrics()))
+    return fetched, entries
+
+def search(db, terms, package=None, limit=50):
+    """Entries containing every term (AND), newest first."""
+    terms = [term.lower() for term in terms]
+    if not terms:
+        return []
+    # Start from the rarest term so the intersection stays small
+    counts = sorted((db.execute("SELECT COUNT(*) FROM terms WHERE term = ?", (term,)).fetchone()[0], term)
+                    for term in terms)
+    if counts[0][0] == 0:
+        return []
+    ordered = [term for _, term in counts]
+    sql = "SELECT entry_id FROM terms WHERE term = ?"
+    for _ in ordered[1:]:
+        sql += " INTERSECT SELECT entry_id FROM terms WHERE term = ?"
+    query = (f"SELECT package, version, distribution, urgency, date, maintainer, text FROM entries "
+             f"WHERE id IN ({sql})")
+    params = list(ordered)
+    if package:
+        query += " AND package = ?"
+        params.append(package)
+    query += " ORDER BY date DESC LIMIT ?"
+    params.append(limit)
+    columns = ("package", "version", "distribution", "urgency", "date", "maintainer", "text")
+    return [dict(zip(columns, row)) for row in db.execute(query, params)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch, parse and search Ubuntu changelogs')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fetch = sub.add_parser('fetch', help='Fetch changelogs not seen before and index them')
+    fetch.add_argument('-i', '--input', action='append', required=True,
+                       help='Crawler output (JSON, binary shard directory or --jsonl-dir) or parser.py output; may be repeated')
+    fetch.add_argument('--limit', type=int, help='Fetch at most this many new changelogs')
+    fetch.add_argument('-v', '--verbose', action='store_true', help='Report failed fetches')
+    for name, help_text in (('search', 'Find entries containing all the given words'),
+                            ('cve', 'Find entries mentioning a CVE id')):
+        query = sub.add_parser(name, help=help_text)
+        query.add_argument('terms', nargs='+', help='Words' if name == 'search' else 'CVE ids, e.g. CVE-2024-12345')
+        query.add_argument('--package', help='Limit to one package')
+        query.add_argument('-n', '--limit', type=int, default=50, help='Maximum number of entries')
+    for command in sub.choices.values():
+        command.add_argument('-d', '--database', default='changelogs.sqlite3', help='Changelog index database')
+    args = parser.parse_args(argv)
+
+    db = connect(args.database)
+    if args.command == 'fetch':
+        seen = {url for (url,) in db.execute(
+            f"SELECT url FROM documents WHERE status IN ({', '.join('?' * len(FINAL_STATUSES))})", FINAL_STATUSES)}
+        pending = [item for item in changelog_urls(args.input) if item[0] not in seen]
+        if args.limit is not None:
+            pending = pending[:args.limit]
+        print(f"{len(seen)} changelogs already indexed, {len(pending)} to fetch")
+        fetched, entries = asyncio.run(fetch_all(db, pending, args.verbose))
+        print(f"✅ Indexed {fetched} changelogs ({entries} new entries) into {args.database}")
+    elif args.command == 'cve':
+        results = {}
+        for cve in args.terms:
+            results[cve.upper()] = search(db, [cve], args.package, args.limit)
+        print(json.dumps(results, indent=2))
+    else:
+        terms = sorted({term for word in args.terms for term in tokenize(word)})
+        print(json.dumps(search(db, terms, args.package, args.limit), indent=2))
+    db.close()
+
+if __name__ == "__main__":
+    main()
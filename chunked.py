@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Index Chunked Parsing
+Version: 1.0.0
+Description: Splits a decompressed Packages/Sources index at blank-line stanza
+boundaries and parses the chunks on a process pool. The index is placed in one
+shared-memory block that every worker maps, so only (offset, length) pairs are
+sent to the workers instead of pickled chunk text; results come back in order.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+from records import PackageTable
+from depends import DependencyIndex
+
+# Below this many decompressed bytes a process pool costs more than it saves
+PARALLEL_THRESHOLD = 4 << 20
+
+def split_chunks(data, parts):
+    """Cut data into about `parts` (start, end) slices, each ending on a stanza boundary."""
+    step = max(1, len(data) // max(1, parts))
+    bounds = []
+    start = 0
+    while start < len(data):
+        end = data.find(b"\n\n", start + step)
+        end = len(data) if end < 0 else end + 2
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def make_executor(processes=None):
+    # Start the resource tracker before any worker exists so they all share it;
+    # a worker attaching to a block then cannot unlink it when it exits.
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(max_workers=processes)
+
+def _run_chunk(name, start, end, parse_fn, args):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        text = str(shm.buf[start:end], "utf-8", "replace")
+    finally:
+        shm.close()
+    return parse_fn(text, *args)
+
+def parallel_parse(data, parse_fn, executor, parts, *args):
+    """
+    Run parse_fn(chunk_text, *args) over stanza-aligned chunks of `data` on
+    `executor` and return the per-chunk results in input order.
+    parse_fn must be a module-level function so workers can import it.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[:len(data)] = data
+        futures = [executor.submit(_run_chunk, shm.name, start, end, parse_fn, args)
+                   for start, end in split_chunks(data, parts)]
+        return [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+def parse_packages_chunk(text, release, component, architecture, with_deps):
+    """Worker: parse whole Packages stanzas into a PackageTable (and DependencyIndex)."""
+    table = PackageTable()
+    deps = DependencyIndex() if with_deps else None
+    for stanza in text.split("\n\n"):
+        lines = stanza.strip("\n").split("\n")
+        if lines[0] and table.append_stanza(lines, release, component, architecture) and deps is not None:
+            deps.add_stanza(lines, release, architecture)
+    return table, deps
+
+def parse_packages(data, executor, parts, release, component, architecture=None, with_deps=False):
+    """Parse one decompressed Packages index in parallel; returns [(table, deps), ...] in order."""
+    return parallel_parse(data, parse_packages_chunk, executor, parts,
+                          release, component, architecture, with_deps)
@@ -0,0 +1,22 @@
+"""
+Ubuntu Project and Package Dashboard
+Version: 1.0.0
+Description: One entry point for the dashboard tools. `python -m copr <command>`
+dispatches to the existing scripts (indexer.py, parser.py, sizer.py, ...), which
+stay runnable on their own. A script is only imported when its command is
+chosen, so heavy dependencies (bs4, matplotlib, numpy, apt, aiohttp) are never
+loaded for commands that do not need them.
+
+The stages can also be chained in one process, sharing the HTTP client and its
+per-host limits:
+
+    import copr
+    copr.run(["index", "-o", "ubuntu_indexes.json"])
+    copr.run(["parse", "-i", "ubuntu_indexes.json", "-o", "parsed_packages.json"])
+    sizer = copr.load("size")  # the sizer.py module itself
+"""
+
+from copr.cli import COMMANDS, load, run
+
+__version__ = "1.0.0"
+__all__ = ["COMMANDS", "load", "run", "__version__"]
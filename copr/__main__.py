@@ -0,0 +1,5 @@
+import sys
+
+from copr.cli import main
+
+sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Dashboard CLI
+Version: 1.0.0
+Description: `copr <command> [options]` for every dashboard tool. Only argparse
+and importlib are loaded at startup; the script behind a command is imported
+when that command runs and its main(argv) is called in-process.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (script in the repository root, help)
+COMMANDS = {
+    "index": ("indexer.py", "Discover the Packages.gz/Sources.gz indexes of the archives or a local mirror"),
+    "parse": ("parser.py", "Parse Packages.gz indexes into package records"),
+    "size": ("sizer.py", "Total package and source sizes per suite/component/architecture"),
+    "track": ("tracker.py", "Compare GA and Updates repository states"),
+    "delta": ("delta.py", "Fetch indexes and emit/apply deltas against their previous fetch"),
+    "matrix": ("matrix.py", "Build or query the package x release x architecture matrix"),
+    "chart": ("new-tracker.py", "Plot repository growth charts"),
+    "crawl": ("changelog-crawler.py", "Crawl changelogs.ubuntu.com for copyright and changelog URLs"),
+    "query": ("query.py", "Look up package copyright, licenses and changelogs"),
+    "changelogs": ("changelogs.py", "Fetch, index and search changelogs"),
+    "deps": ("depends.py", "Query the dependency index"),
+    "advisories": ("advisories.py", "Report packages below USN fixed versions"),
+    "export": ("dbexport.py", "Export parsed data to the dashboard database"),
+    "api": ("api.py", "Serve the package query API"),
+    "replay": ("replay.py", "Record and replay HTTP fixtures"),
+    "version": ("debversion.py", "Compare and sort Debian versions"),
+}
+
+def load(command):
+    """Import (once) and return the module behind a command."""
+    script = COMMANDS[command][0]
+    name = script[:-3].replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)  # the scripts import their sibling modules directly
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+def run(argv):
+    """Run one command in-process, e.g. run(["parse", "-i", "ubuntu_indexes.json"]); returns its exit status."""
+    command, *rest = argv
+    try:
+        status = load(command).main(rest)
+    except SystemExit as e:  # argparse errors and --help
+        status = e.code
+    return status or 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='copr', description='Ubuntu Project and Package Dashboard tools')
+    sub = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for command, (script, help_text) in COMMANDS.items():
+        sub.add_parser(command, help=help_text, add_help=False)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Only the command name is parsed here; everything after it belongs to the command
+    if not argv or argv[0] not in COMMANDS:
+        build_parser().parse_args(argv[:1])
+    sys.argv[0] = f"copr {argv[0]}"
+    return run(argv)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Dashboard Database Exporter
+Version: 1.0.0
+Description: Builds a compact, indexed SQLite file from the parser, sizer and
+tracker outputs for the browser dashboard (sql.js, js/sql-wasm.wasm).
+Repeated strings are stored once in lookup tables, totals are pre-aggregated,
+and the page size is kept small so an HTTP range-request VFS only fetches the
+pages a query touches.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from records import component_from_url
+from shards import read_json_list, read_shards
+
+SCRIPT_VERSION = "1.0.0"
+PAGE_SIZE = 1024  # small pages keep range requests for point lookups short
+LOOKUPS = ("release", "component", "architecture", "section", "maintainer")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE delta_watermark (sequence INTEGER NOT NULL);
+CREATE TABLE release (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE component (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE architecture (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE section (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE maintainer (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE packages (
+    id INTEGER PRIMARY KEY,
+    package TEXT NOT NULL,
+    version TEXT,
+    source TEXT,
+    release_id INTEGER REFERENCES release(id),
+    component_id INTEGER REFERENCES component(id),
+    architecture_id INTEGER REFERENCES architecture(id),
+    section_id INTEGER REFERENCES section(id),
+    maintainer_id INTEGER REFERENCES maintainer(id),
+    size INTEGER
+);
+CREATE TABLE sizes (
+    release TEXT NOT NULL,
+    component TEXT NOT NULL,
+    architecture TEXT NOT NULL,
+    packages INTEGER,
+    total_size INTEGER,
+    projects INTEGER,
+    source_size INTEGER,
+    failed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (release, component, architecture)
+) WITHOUT ROWID;
+CREATE TABLE changes (
+    release TEXT NOT NULL,
+    component TEXT NOT NULL,
+    architecture TEXT NOT NULL,
+    package TEXT NOT NULL,
+    change TEXT NOT NULL,
+    old_version TEXT,
+    new_version TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX packages_package ON packages(package);
+CREATE INDEX packages_source ON packages(source);
+CREATE INDEX packages_location ON packages(release_id, component_id, architecture_id);
+CREATE INDEX changes_package ON changes(package);
+CREATE INDEX changes_location ON changes(release, component, architecture);
+"""
+
+RELEASE_TOTALS = """
+    SELECT release,
+           SUM(CASE WHEN architecture LIKE 'binary-%' THEN packages ELSE 0 END) AS packages,
+           SUM(CASE WHEN architecture LIKE 'binary-%' THEN total_size ELSE 0 END) AS total_size,
+           SUM(CASE WHEN architecture = 'source' THEN projects ELSE 0 END) AS sources,
+           SUM(CASE WHEN architecture = 'source' THEN source_size ELSE 0 END) AS source_size,
+           MAX(failed) AS failed
+    FROM sizes GROUP BY release ORDER BY release"""
+COMPONENT_TOTALS = """
+    SELECT release, component,
+           SUM(COALESCE(packages, 0)) AS packages, SUM(COALESCE(total_size, 0)) AS total_size,
+           SUM(COALESCE(projects, 0)) AS sources, SUM(COALESCE(source_size, 0)) AS source_size
+    FROM sizes GROUP BY release, component ORDER BY release, component"""
+
+# Pre-aggregated tables answer the dashboard's summary cards without scanning packages/sizes
+AGGREGATES = f"""
+CREATE TABLE release_totals AS {RELEASE_TOTALS};
+CREATE TABLE component_totals AS {COMPONENT_TOTALS};
+CREATE TABLE change_totals AS
+    SELECT release, component, architecture, change, COUNT(*) AS packages
+    FROM changes GROUP BY release, component, architecture, change;
+CREATE TABLE section_totals AS
+    SELECT r.name AS release, s.name AS section, COUNT(*) AS packages, SUM(p.size) AS total_size
+    FROM packages p JOIN release r ON r.id = p.release_id LEFT JOIN section s ON s.id = p.section_id
+    GROUP BY p.release_id, p.section_id;
+CREATE VIEW package_view AS
+    SELECT p.package, p.version, p.source, r.name AS release, c.name AS component,
+           a.name AS architecture, s.name AS section, m.name AS maintainer, p.size
+    FROM packages p
+    LEFT JOIN release r ON r.id = p.release_id
+    LEFT JOIN component c ON c.id = p.component_id
+    LEFT JOIN architecture a ON a.id = p.architecture_id
+    LEFT JOIN section s ON s.id = p.section_id
+    LEFT JOIN maintainer m ON m.id = p.maintainer_id;
+CREATE VIEW dashboard_totals AS
+    SELECT SUM(packages) AS packages, SUM(total_size) AS total_size,
+           SUM(sources) AS sources, SUM(source_size) AS source_size
+    FROM release_totals;
+"""
+
+def load_packages(path):
+    """Iterate parser.py output: a JSON list (streamed item by item), or a --jsonl-dir shard directory."""
+    if os.path.isdir(path):
+        return read_shards(path)
+    return read_json_list(path)
+
+class Lookups:
+    """Assigns ids for the small string lookup tables as rows are inserted."""
+
+    def __init__(self, db):
+        self.db = db
+        self.ids = {table: dict(db.execute(f"SELECT name, id FROM {table}")) for table in LOOKUPS}
+
+    def id(self, table, name):
+        if name is None:
+            return None
+        ids = self.ids[table]
+        if name not in ids:
+            ids[name] = len(ids) + 1
+            self.db.execute(f"INSERT INTO {table} (id, name) VALUES (?, ?)", (ids[name], name))
+        return ids[name]
+
+def insert_packages(db, entries):
+    lookups = Lookups(db)
+    rows = (
+        (entry["package"], entry.get("version"), entry.get("source"),
+         lookups.id("release", entry.get("release")),
+         lookups.id("component", component_from_url(entry.get("changelog"))),
+         lookups.id("architecture", entry.get("architecture")),
+         lookups.id("section", entry.get("section")),
+         lookups.id("maintainer", entry.get("maintainer")),
+         entry.get("size"))
+        for entry in entries
+    )
+    db.executemany("INSERT INTO packages (package, version, source, release_id, component_id, "
+                   "architecture_id, section_id, maintainer_id, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+def insert_sizes(db, sizes):
+    rows = []
+    for release, components in sizes.items():
+        for component, arches in components.items():
+            for arch, stats in arches.items():
+                rows.append((release, component, arch, stats.get("packages"), stats.get("total_size"),
+                             stats.get("projects"), stats.get("source_size"), int(bool(stats.get("failed")))))
+    db.executemany("INSERT INTO sizes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+def insert_changes(db, changes):
+    rows = []
+    for release, components in changes.items():
+        for component, arches in components.items():
+            for arch, report in arches.items():
+                rows.extend((release, component, arch, pkg, "new", None, None)
+                            for pkg in report.get("new_packages", []))
+                rows.extend((release, component, arch, pkg, "removed", None, None)
+                            for pkg in report.get("removed_packages", []))
+                rows.extend((release, component, arch, pkg, "version", change.get("old"), change.get("new"))
+                            for pkg, change in report.get("version_changes", {}).items())
+    db.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+def export(output, packages=None, sizes=None, changes=None):
+    if os.path.exists(output):
+        os.remove(output)
+    db = sqlite3.connect(output)
+    db.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+    db.execute("PRAGMA journal_mode = DELETE")  # a single file the dashboard can range-request
+    db.executescript(SCHEMA)
+    with db:
+        if packages:
+            insert_packages(db, load_packages(packages))
+        if sizes:
+            with open(sizes) as f:
+                insert_sizes(db, json.load(f))
+        if changes:
+            with open(changes) as f:
+                insert_changes(db, json.load(f))
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("generated_at", datetime.now().isoformat()),
+            ("script_version", SCRIPT_VERSION),
+        ])
+    db.executescript(INDEXES + AGGREGATES)
+    db.execute("ANALYZE")
+    db.execute("VACUUM")  # pack pages so related rows sit next to each other
+    db.close()
+
+def _bump_section_totals(db, release, section, packages, size):
+    cursor = db.execute("UPDATE section_totals SET packages = packages + ?, total_size = COALESCE(total_size, 0) + ? "
+                        "WHERE release = ? AND section IS ?", (packages, size or 0, release, section))
+    if not cursor.rowcount:
+        db.execute("INSERT INTO section_totals VALUES (?, ?, ?, ?)", (release, section, packages, size))
+
+def _apply_package_delta(db, lookups, delta):
+    """Upsert added/changed package rows and delete removed ones, keeping section_totals in step."""
+    release = delta["release"]
+    location = (lookups.id("release", release), lookups.id("component", delta["component"]))
+    sections = {idx: name for name, idx in lookups.ids["section"].items()}
+
+    def find(record):
+        # Versions are stored without their epoch, as insert_packages does
+        return db.execute("SELECT id, section_id, size FROM packages WHERE package = ? AND release_id IS ? "
+                          "AND component_id IS ? AND architecture_id IS ? AND version = ?",
+                          (record["package"], *location, lookups.id("architecture", record["architecture"]),
+                           record["version"].split(":")[-1])).fetchone()
+
+    for record in delta["removed"]:
+        row = find(record)
+        if row is not None:
+            db.execute("DELETE FROM packages WHERE id = ?", (row[0],))
+            _bump_section_totals(db, release, sections.get(row[1]), -1, -(row[2] or 0))
+
+    for old, record in [(None, record) for record in delta["added"]] + delta["changed"]:
+        # Added stanzas are new rows, unless an initial delta meets rows already exported
+        if old is not None:
+            row = find(old) or find(record)
+        else:
+            row = find(record) if delta["initial"] else None
+        values = (record["version"].split(":")[-1], record["source"], lookups.id("section", record["section"]),
+                  lookups.id("maintainer", record["maintainer"]), record["size"])
+        if row is None:
+            db.execute("INSERT INTO packages (package, release_id, component_id, architecture_id, version, source, "
+                       "section_id, maintainer_id, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (record["package"], *location, lookups.id("architecture", record["architecture"]), *values))
+        else:
+            db.execute("UPDATE packages SET version = ?, source = ?, section_id = ?, maintainer_id = ?, size = ? "
+                       "WHERE id = ?", (*values, row[0]))
+            _bump_section_totals(db, release, sections.get(row[1]), -1, -(row[2] or 0))
+        sections.setdefault(values[2], record["section"])
+        _bump_section_totals(db, release, record["section"], 1, record["size"])
+
+def _apply_size_delta(db, delta):
+    from sizer import apply_delta
+    columns = ("packages", "total_size", "projects", "source_size")
+    row = db.execute(f"SELECT {', '.join(columns)}, failed FROM sizes WHERE release = ? AND component = ? "
+                     f"AND architecture = ?", (delta["release"], delta["component"], delta["architecture"])).fetchone()
+    stats = {}
+    if row is not None:
+        stats = {column: value for column, value in zip(columns, row) if value is not None}
+        if row[-1]:
+            stats["failed"] = True
+    stats = apply_delta({delta["release"]: {delta["component"]: {delta["architecture"]: stats}}}, delta)
+    db.execute("INSERT OR REPLACE INTO sizes VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+               (delta["release"], delta["component"], delta["architecture"], *(stats.get(c) for c in columns)))
+
+def apply_deltas(output, deltas):
+    """
+    Apply delta.py deltas to an exported database in place. Only the changed
+    packages are touched; section and change totals are adjusted by the same
+    amounts and the release/component totals are rebuilt from the small sizes table.
+    Deltas at or below the delta_watermark sequence were applied before and are
+    skipped, so a feed can be replayed safely. Returns the number applied.
+    """
+    from tracker import delta_report
+
+    db = sqlite3.connect(output)
+    with db:
+        # Databases exported before the watermark existed get it on their first delta
+        db.execute("CREATE TABLE IF NOT EXISTS delta_watermark (sequence INTEGER NOT NULL)")
+        watermark = db.execute("SELECT COALESCE(MAX(sequence), 0) FROM delta_watermark").fetchone()[0]
+    deltas = [delta for delta in deltas if delta.get("sequence", watermark + 1) > watermark]
+    if not deltas:
+        db.close()
+        return 0
+
+    with db:
+        lookups = Lookups(db)
+        for delta in deltas:
+            if delta["kind"] == "packages":
+                _apply_package_delta(db, lookups, delta)
+            _apply_size_delta(db, delta)
+        db.execute("DELETE FROM section_totals WHERE packages <= 0")
+
+        report = delta_report(deltas)
+        insert_changes(db, report)
+        for release, components in report.items():
+            for component, arches in components.items():
+                for arch, arch_report in arches.items():
+                    for change, count in (("new", len(arch_report["new_packages"])),
+                                          ("removed", len(arch_report["removed_packages"])),
+                                          ("version", len(arch_report["version_changes"]))):
+                        if not count:
+                            continue
+                        cursor = db.execute("UPDATE change_totals SET packages = packages + ? WHERE release = ? "
+                                            "AND component = ? AND architecture = ? AND change = ?",
+                                            (count, release, component, arch, change))
+                        if not cursor.rowcount:
+                            db.execute("INSERT INTO change_totals VALUES (?, ?, ?, ?, ?)",
+                                       (release, component, arch, change, count))
+
+        db.execute("DELETE FROM release_totals")
+        db.execute(f"INSERT INTO release_totals {RELEASE_TOTALS}")
+        db.execute("DELETE FROM component_totals")
+        db.execute(f"INSERT INTO component_totals {COMPONENT_TOTALS}")
+        db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", ("updated_at", datetime.now().isoformat()))
+        highest = max(delta.get("sequence", 0) for delta in deltas)
+        if highest > watermark:
+            db.execute("DELETE FROM delta_watermark")
+            db.execute("INSERT INTO delta_watermark VALUES (?)", (highest,))
+    db.close()
+    return len(deltas)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ubuntu Dashboard Database Exporter')
+    parser.add_argument('-p', '--packages', help='Parsed packages JSON or --jsonl-dir shard directory (parser.py output)')
+    parser.add_argument('-s', '--sizes', help='Repository size JSON (sizer.py output)')
+    parser.add_argument('-c', '--changes', help='Change report JSON (tracker.py output)')
+    parser.add_argument('-d', '--deltas', help='Delta feed (delta.py output) to apply to the database after exporting, or to an existing --output on its own')
+    parser.add_argument('-o', '--output', default='ubuntu_dashboard.sqlite3', help='Output SQLite filename')
+    args = parser.parse_args(argv)
+
+    if not (args.packages or args.sizes or args.changes or args.deltas):
+        parser.error("at least one of --packages, --sizes, --changes or --deltas is required")
+    if args.packages or args.sizes or args.changes:
+        export(args.output, args.packages, args.sizes, args.changes)
+    if args.deltas:
+        if not os.path.exists(args.output):
+            parser.error(f"{args.output} does not exist; export it first or pass --packages/--sizes/--changes")
+        from delta import read_feed
+        applied = apply_deltas(args.output, list(read_feed(args.deltas)))
+        print(f"{applied} new deltas applied from {args.deltas}")
+    print(f"✅ Data successfully written to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Debian Version Comparison
+Version: 1.0.0
+Description: dpkg-compatible version ordering. A version string is parsed once
+into epoch/upstream/revision and a precomputed tuple sort key, so versions can be
+compared, sorted and bisected in bulk with plain tuple comparisons.
+
+Usage:
+    python3 debversion.py --check            # verify against known dpkg orderings (and apt_pkg if installed)
+    python3 debversion.py --benchmark 200000 # time compare/sort against apt_pkg.version_compare
+"""
+
+import argparse
+import random
+import re
+import time
+from functools import lru_cache, total_ordering
+
+_PARTS = re.compile(r"(\D*)(\d*)")
+# Marks the end of a string: compares like an empty non-digit part followed by 0
+_END = ((0,), 0)
+
+def _char_order(c):
+    """dpkg lexical order: '~' sorts before everything (even the end), then letters, then the rest."""
+    if c == "~":
+        return -1
+    if c.isalpha():
+        return ord(c)
+    return ord(c) + 256
+
+@lru_cache(maxsize=1 << 16)
+def _part_key(text):
+    """Key of an upstream version or revision: alternating (non-digit run, number) pairs."""
+    key = []
+    for letters, digits in _PARTS.findall(text):
+        if not letters and not digits:
+            continue
+        key.append(tuple(_char_order(c) for c in letters) + (0,))
+        key.append(int(digits) if digits else 0)
+    key.extend(_END)
+    return tuple(key)
+
+@total_ordering
+class Version:
+    """A parsed Debian version; comparisons use the precomputed `key`."""
+    __slots__ = ("epoch", "upstream", "revision", "key")
+
+    def __init__(self, version):
+        version = version.strip()
+        epoch, sep, rest = version.partition(":")
+        if not sep:
+            epoch, rest = "0", version
+        upstream, sep, revision = rest.rpartition("-")
+        if not sep:
+            upstream, revision = rest, ""
+        self.epoch = int(epoch) if epoch.isdigit() else 0
+        self.upstream = upstream
+        self.revision = revision
+        self.key = (self.epoch, _part_key(upstream), _part_key(revision or "0"))
+
+    def __str__(self):
+        text = f"{self.epoch}:{self.upstream}" if self.epoch else self.upstream
+        return f"{text}-{self.revision}" if self.revision else text
+
+    def __repr__(self):
+        return f"Version('{self}')"
+
+    def __eq__(self, other):
+        return self.key == _as_version(other).key
+
+    def __lt__(self, other):
+        return self.key < _as_version(other).key
+
+    def __hash__(self):
+        return hash(self.key)
+
+@lru_cache(maxsize=1 << 18)
+def parse(version):
+    """Parse a version string, reusing the result for repeated strings."""
+    return Version(version)
+
+def _as_version(value):
+    return value if isinstance(value, Version) else parse(value)
+
+def sort_key(version):
+    """Key function for sorted()/bisect: sorted(versions, key=sort_key)."""
+    return parse(version).key
+
+def compare(a, b):
+    """Return -1, 0 or 1 like apt_pkg.version_compare (sign only)."""
+    ka, kb = sort_key(a), sort_key(b)
+    return (ka > kb) - (ka < kb)
+
+def max_version(versions):
+    return max(versions, key=sort_key)
+
+def strip_epoch(version):
+    """The version without its epoch, as used in pool file and changelog paths."""
+    return version.split(":", 1)[-1]
+
+# Pairs in ascending order, taken from dpkg's own version comparison tests
+KNOWN_ORDER = [
+    ("1.0~rc1", "1.0"),
+    ("1.0", "1.0-1"),
+    ("1.0-1", "1.0-1ubuntu1"),
+    ("1.0-1ubuntu1", "1.0-1ubuntu1.1"),
+    ("1.0-1ubuntu1.1", "1.0-2"),
+    ("1.0", "1.0.1"),
+    ("1.0", "1.0a"),
+    ("1.0a", "1.0+b1"),
+    ("1.0~~", "1.0~~a"),
+    ("1.0~~a", "1.0~"),
+    ("1.0~", "1.0"),
+    ("1.9", "1.10"),
+    ("2.30-0ubuntu1", "2:1.0"),
+    ("1:1.2.3", "1:1.2.4"),
+    ("0:1.0", "1:0.1"),
+    ("a", "b"),
+    ("a", "+"),
+    ("3.0-1", "3.0.0-1"),
+]
+
+def check():
+    """Verify the known orderings (and random pairs against apt_pkg when available)."""
+    failures = 0
+    for low, high in KNOWN_ORDER:
+        if not (compare(low, high) < 0 and compare(high, low) > 0):
+            print(f"FAIL: expected {low} < {high}")
+            failures += 1
+    for equal in (("1.0", "1.00"), ("0:1.0", "1.0"), ("1.0-0", "1.0"), ("a0", "a")):
+        if compare(*equal) != 0:
+            print(f"FAIL: expected {equal[0]} == {equal[1]}")
+            failures += 1
+    apt_pkg = _load_apt_pkg()
+    if apt_pkg:
+        versions = sample_versions(20000)
+        for a, b in zip(versions, reversed(versions)):
+            expected = apt_pkg.version_compare(a, b)
+            if compare(a, b) != (expected > 0) - (expected < 0):
+                print(f"FAIL: {a} vs {b}: apt_pkg says {expected}")
+                failures += 1
+    print(f"{'OK' if not failures else f'{failures} failures'}"
+          f"{'' if apt_pkg else ' (apt_pkg not installed, cross-check skipped)'}")
+    return failures == 0
+
+def _load_apt_pkg():
+    try:
+        import apt_pkg
+    except ImportError:
+        return None
+    apt_pkg.init_system()
+    return apt_pkg
+
+def sample_versions(count, seed=1):
+    rng = random.Random(seed)
+    pieces = ["1", "2", "10", "0", ".", "~", "+", "a", "b", "rc", "ubuntu", "build", "dfsg", "git"]
+    versions = []
+    for _ in range(count):
+        upstream = rng.choice("0123456789") + "".join(rng.choice(pieces) for _ in range(rng.randint(1, 6)))
+        version = upstream
+        if rng.random() < 0.1:
+            version = f"{rng.randint(1, 3)}:{version}"
+        if rng.random() < 0.8:
+            version += "-" + rng.choice("0123456789") + "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3)))
+        versions.append(version)
+    return versions
+
+def benchmark(count):
+    versions = sample_versions(count)
+    pairs = list(zip(versions, reversed(versions)))
+    parse.cache_clear()
+    _part_key.cache_clear()
+
+    start = time.perf_counter()
+    keys = [sort_key(v) for v in versions]
+    print(f"parse + key:      {time.perf_counter() - start:.3f}s for {count} versions")
+    start = time.perf_counter()
+    for a, b in pairs:
+        compare(a, b)
+    print(f"compare (cached): {time.perf_counter() - start:.3f}s for {len(pairs)} pairs")
+    start = time.perf_counter()
+    sorted(keys)
+    print(f"sort by key:      {time.perf_counter() - start:.3f}s")
+
+    apt_pkg = _load_apt_pkg()
+    if not apt_pkg:
+        print("apt_pkg not installed; skipping comparison")
+        return
+    start = time.perf_counter()
+    for a, b in pairs:
+        apt_pkg.version_compare(a, b)
+    print(f"apt_pkg compare:  {time.perf_counter() - start:.3f}s for {len(pairs)} pairs")
+    from functools import cmp_to_key
+    start = time.perf_counter()
+    sorted(versions, key=cmp_to_key(apt_pkg.version_compare))
+    print(f"apt_pkg sort:     {time.perf_counter() - start:.3f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='dpkg-compatible Debian version comparison')
+    parser.add_argument('--check', action='store_true', help='Verify known dpkg orderings (and against apt_pkg if installed)')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Benchmark parsing/comparison/sorting of N versions')
+    parser.add_argument('versions', nargs='*', help='Versions to sort')
+    args = parser.parse_args(argv)
+
+    if args.check:
+        raise SystemExit(0 if check() else 1)
+    if args.benchmark:
+        benchmark(args.benchmark)
+    for version in sorted(args.versions, key=sort_key):
+        print(version)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Pool Deduplication
+Version: 1.0.0
+Description: Counts each pool file once across suites, components and
+architectures. Files are keyed by a 64-bit hash of their archive and pool path
+(the same path on archive.ubuntu.com and ports.ubuntu.com is two files), kept in an
+open-addressing table backed by a flat array (8 bytes per slot) so tens of
+millions of entries stay within a few hundred MB.
+"""
+
+import hashlib
+from array import array
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def file_key(filename=None, sha256=None, archive=None):
+    """
+    64-bit key of a pool file in an archive: its path when known (that is what a
+    mirror stores), else its checksum. Without an archive, paths are compared as is.
+    """
+    if filename:
+        key = _hash64(f"{archive.rstrip('/')}/{filename}" if archive else filename)
+    elif sha256:
+        key = int(sha256[:16], 16) ^ (_hash64(archive) if archive else 0)
+    else:
+        return None
+    return key or 1  # 0 marks an empty slot
+
+class HashSet64:
+    """Set of non-zero 64-bit integers using linear probing over array('Q')."""
+    __slots__ = ("slots", "mask", "count")
+
+    def __init__(self, capacity=1 << 16):
+        size = 1
+        while size < capacity * 2:
+            size <<= 1
+        self.slots = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        old = self.slots
+        self.slots = array("Q", bytes(16 * len(old)))
+        self.mask = len(self.slots) - 1
+        self.count = 0
+        for key in old:
+            if key:
+                self.add(key)
+
+    def add(self, key):
+        """Insert key; returns True if it was not present yet."""
+        slots, mask = self.slots, self.mask
+        i = (key * 0x9E3779B97F4A7C15 >> 32) & mask
+        while True:
+            current = slots[i]
+            if current == key:
+                return False
+            if not current:
+                slots[i] = key
+                self.count += 1
+                if self.count * 10 > len(slots) * 7:
+                    self._grow()
+                return True
+            i = (i + 1) & mask
+
+    def __contains__(self, key):
+        slots, mask = self.slots, self.mask
+        i = (key * 0x9E3779B97F4A7C15 >> 32) & mask
+        while slots[i]:
+            if slots[i] == key:
+                return True
+            i = (i + 1) & mask
+        return False
+
+class UniqueSizer:
+    """Accumulates naive (per-index) and unique (per pool file) totals."""
+
+    def __init__(self):
+        self.seen = HashSet64()
+        self.naive_files = 0
+        self.naive_size = 0
+        self.unique_files = 0
+        self.unique_size = 0
+
+    def add(self, size, filename=None, sha256=None, archive=None):
+        self.naive_files += 1
+        self.naive_size += size
+        key = file_key(filename, sha256, archive)
+        if key is None or self.seen.add(key):
+            self.unique_files += 1
+            self.unique_size += size
+
+    def report(self):
+        return {
+            "naive": {"files": self.naive_files, "size": self.naive_size},
+            "unique": {"files": self.unique_files, "size": self.unique_size},
+            "duplicate_size": self.naive_size - self.unique_size
+        }
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Index Delta Feed
+Version: 1.0.0
+Description: Compares every freshly fetched Packages/Sources index with a
+snapshot of its previous fetch and emits a compact delta: the stanzas added,
+removed and changed, keyed by package/architecture/version and identified by a
+hash of the stanza, so every stanza the sizer counts is tracked. Consumers apply the delta instead of reprocessing the whole index
+(sizer.apply_delta, tracker.delta_report, dbexport.apply_deltas and
+api.PackageStore.apply_delta), so a refresh of -updates or -security costs in
+proportion to the packages that changed. An index whose file hash matches its
+snapshot is not decompressed at all.
+
+Snapshot: <snapshot-dir>/<host>/<index path>.json.gz
+    {"format", "index_url", "sha256", "kind", "count", "size", "entries": {key: [hash, record]}}
+Delta (one JSON line per index in the feed):
+    {"sequence", "index_url", "release", "component", "architecture", "kind", "initial",
+     "previous_sha256", "sha256", "fetched_at", "count", "size", "unchanged",
+     "added": [record], "removed": [record], "changed": [[old, new]]}
+
+Binary records carry package, version, source, section, maintainer, size and
+architecture; source records carry package, version, directory and size (the
+sum of the source files). "initial" deltas have no previous snapshot and list
+every stanza as added. A package whose version moved shows up in "changed"
+([old, new]); its old and new stanzas are paired by version order. "sequence" numbers the deltas of a feed from 1 upwards;
+dbexport.apply_deltas records the highest one applied and skips anything at or
+below it, so replaying a feed onto a database is harmless.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from debversion import sort_key
+from downloader import cache_path, download_all
+from mirror import discover_indexes, iter_stanzas, open_index
+import sources
+
+SNAPSHOT_DIR = "index_snapshots"
+SNAPSHOT_FORMAT = 2  # snapshots of another format are ignored, so the next fetch is an initial delta
+CHUNK_SIZE = 1 << 16
+
+def stanza_hash(lines):
+    return hashlib.blake2b("\n".join(lines).encode("utf-8"), digest_size=8).hexdigest()
+
+def package_record(lines, architecture=None):
+    """Fields of one Packages stanza; the index's architecture wins, as in records.PackageTable."""
+    fields = {}
+    for line in lines:
+        key, _, value = line.partition(": ")
+        if key in ("Package", "Version", "Source", "Section", "Maintainer", "Size", "Architecture"):
+            fields[key] = value
+    if "Package" not in fields or "Version" not in fields:
+        return None
+    return {
+        "package": fields["Package"],
+        "version": fields["Version"],
+        "source": fields.get("Source", fields["Package"]).split()[0],
+        "section": fields.get("Section"),
+        "maintainer": fields.get("Maintainer"),
+        "size": int(fields["Size"]) if "Size" in fields else None,
+        "architecture": architecture or fields.get("Architecture")
+    }
+
+def source_record(lines):
+    parsed = sources.parse_stanza(lines)
+    if parsed is None:
+        return None
+    source, version, directory, files, binaries = parsed
+    return {"package": source, "version": version, "directory": directory,
+            "size": sum(size for _, size, _ in files)}
+
+def read_entries(location, architecture):
+    """
+    {package/arch/version: [stanza hash, record]} for one index, one entry per
+    stanza as the sizer counts them; a repeated stanza gets a #n suffix.
+    """
+    is_source = architecture == "source"
+    arch = architecture.replace("binary-", "")
+    entries = {}
+    with open_index(location) as stream:
+        for lines in iter_stanzas(stream):
+            record = source_record(lines) if is_source else package_record(lines, arch)
+            if record is None:
+                continue
+            key = base = f"{record['package']}/{arch}/{record['version']}"
+            repeat = 1
+            while key in entries:
+                repeat += 1
+                key = f"{base}#{repeat}"
+            entries[key] = [stanza_hash(lines), record]
+    return entries
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_path(snapshot_dir, index_url):
+    return cache_path(snapshot_dir, index_url) + ".json.gz"
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    return snapshot if snapshot.get("format") == SNAPSHOT_FORMAT else None
+
+def save_snapshot(path, snapshot):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+def pair_versions(added, removed):
+    """
+    Move stanzas of the same package and architecture that were removed and added
+    into [old, new] pairs, lowest versions first; returns (added, removed, changed).
+    """
+    def by_package(records):
+        grouped = {}
+        for record in sorted(records, key=lambda record: sort_key(record["version"])):
+            grouped.setdefault((record["package"], record.get("architecture")), []).append(record)
+        return grouped
+
+    new_by_package = by_package(added)
+    old_by_package = by_package(removed)
+    changed = []
+    for key, old_records in old_by_package.items():
+        new_records = new_by_package.get(key, [])
+        pairs = min(len(old_records), len(new_records))
+        changed.extend([old, new] for old, new in zip(old_records[:pairs], new_records[:pairs]))
+        old_by_package[key] = old_records[pairs:]
+        if key in new_by_package:
+            new_by_package[key] = new_records[pairs:]
+    added = [record for records in new_by_package.values() for record in records]
+    removed = [record for records in old_by_package.values() for record in records]
+    return added, removed, changed
+
+def diff(previous, current):
+    """Return (added, removed, changed, unchanged) between two {key: [hash, record]} maps."""
+    added, removed, changed = pair_versions(
+        [record for key, (_, record) in current.items() if key not in previous],
+        [record for key, (_, record) in previous.items() if key not in current])
+    unchanged = 0
+    for key, (digest, record) in current.items():
+        old = previous.get(key)
+        if old is None:
+            continue
+        if old[0] == digest:
+            unchanged += 1
+        else:
+            changed.append([old[1], record])
+    return added, removed, changed, unchanged
+
+def compute_delta(entry, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Delta of one downloaded index (an ubuntu_indexes.json entry with 'local_path')
+    against its snapshot, which is then replaced by the current state.
+    """
+    path = snapshot_path(snapshot_dir, entry['index_url'])
+    snapshot = load_snapshot(path)
+    sha256 = file_sha256(entry['local_path'])
+    delta = {
+        "index_url": entry['index_url'],
+        "release": entry['release'],
+        "component": entry['component'],
+        "architecture": entry['architecture'],
+        "kind": "sources" if entry['architecture'] == "source" else "packages",
+        "initial": snapshot is None,
+        "previous_sha256": snapshot and snapshot["sha256"],
+        "sha256": sha256,
+        "fetched_at": datetime.now().isoformat()
+    }
+    if snapshot is not None and snapshot["sha256"] == sha256:
+        return dict(delta, count=snapshot["count"], size=snapshot["size"], unchanged=snapshot["count"],
+                    added=[], removed=[], changed=[])
+
+    current = read_entries(entry['local_path'], entry['architecture'])
+    added, removed, changed, unchanged = diff(snapshot["entries"] if snapshot else {}, current)
+    totals = {"count": len(current), "size": sum(record["size"] or 0 for _, record in current.values())}
+    save_snapshot(path, {"format": SNAPSHOT_FORMAT, "index_url": entry['index_url'], "sha256": sha256, "kind": delta["kind"],
+                         **totals, "entries": current})
+    return dict(delta, **totals, unchanged=unchanged, added=added, removed=removed, changed=changed)
+
+def is_empty(delta):
+    return not (delta["added"] or delta["removed"] or delta["changed"])
+
+def read_feed(path):
+    """Yield the deltas of a feed file in the order they were written."""
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def last_sequence(path):
+    """Sequence number of the last delta in a feed, read from its tail; 0 for a new feed."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        tail = b""
+        while end > 0:
+            start = max(0, end - CHUNK_SIZE)
+            f.seek(start)
+            tail = f.read(end - start) + tail
+            end = start
+            lines = tail.rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or end == 0:
+                return json.loads(lines[-1]).get("sequence", 0) if lines[-1].strip() else 0
+    return 0
+
+def refresh(index_data, cache_dir, snapshot_dir=SNAPSHOT_DIR, jobs=4):
+    """Download the indexes and return (deltas, failures)."""
+    entries, failures = download_all(index_data, cache_dir, jobs)
+    deltas = []
+    for entry in entries:
+        try:
+            delta = compute_delta(entry, snapshot_dir)
+        except (OSError, EOFError) as e:
+            failures[entry['index_url']] = f"unreadable index: {e}"
+            continue
+        print(f"{entry['index_url']}: +{len(delta['added'])} -{len(delta['removed'])} "
+              f"~{len(delta['changed'])} ({delta['unchanged']} unchanged)")
+        deltas.append(delta)
+    return deltas, failures
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Fetch indexes and emit deltas against their previous fetch')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('-i', '--index-file', help='Path to ubuntu_indexes.json')
+    source_group.add_argument('-m', '--mirror', help='Path to a local apt mirror; indexes are discovered from its dists/ tree')
+    parser.add_argument('-o', '--output', default='index_deltas.jsonl', help='Delta feed to append to (JSON Lines)')
+    parser.add_argument('-S', '--snapshot-dir', default=SNAPSHOT_DIR, help='Directory holding the snapshot of each index')
+    parser.add_argument('-c', '--cache-dir', default='index_cache', help='Directory for downloaded indexes (partial downloads are resumed)')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Number of concurrent downloads')
+    parser.add_argument('-s', '--suite', action='append', help='Only refresh this suite (repeatable)')
+    parser.add_argument('--component', action='append', help='Only refresh this component (repeatable)')
+    parser.add_argument('-a', '--arch', action='append', help='Only refresh this architecture, e.g. amd64 or source (repeatable)')
+    parser.add_argument('--sizes', help='Apply the deltas to this sizer.py output in place')
+    parser.add_argument('--changes', help='Write the changes of this refresh as a tracker.py report to this JSON file')
+    parser.add_argument('--database', help='Apply the deltas to this dbexport.py database in place')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from sizer import selected
+
+    if args.mirror:
+        index_data = discover_indexes(args.mirror)
+    else:
+        with open(args.index_file, "r") as f:
+            index_data = json.load(f)
+    index_data = [entry for entry in index_data if selected(entry, args.suite, args.component, args.arch)]
+
+    deltas, failures = refresh(index_data, args.cache_dir, args.snapshot_dir, args.jobs)
+    for url, error in failures.items():
+        print(f"Failed to refresh {url}: {error}")
+
+    changed = [delta for delta in deltas if not is_empty(delta)]
+    sequence = last_sequence(args.output)
+    with open(args.output, "a") as f:
+        for delta in changed:
+            sequence += 1
+            delta["sequence"] = sequence
+            f.write(json.dumps(delta, separators=(",", ":")) + "\n")
+    print(f"{len(changed)} of {len(deltas)} indexes changed; deltas appended to {args.output}")
+
+    if args.sizes:
+        from sizer import apply_delta, mark_failed, size_bucket
+        repo_size_data = {}
+        if os.path.exists(args.sizes):
+            with open(args.sizes, "r") as f:
+                repo_size_data = json.load(f)
+        for delta in deltas:
+            apply_delta(repo_size_data, delta)
+        for entry in index_data:
+            if entry['index_url'] in failures:
+                stats = size_bucket(repo_size_data, entry['release'], entry['component'], entry['architecture'])
+                mark_failed(stats, entry['index_url'], failures[entry['index_url']])
+        with open(args.sizes, "w") as f:
+            json.dump(repo_size_data, f, indent=2)
+        print(f"Repository size data updated in {args.sizes}")
+
+    if args.changes:
+        from tracker import delta_report
+        with open(args.changes, "w") as f:
+            json.dump(delta_report(changed), f, indent=2)
+        print(f"Change report saved to {args.changes}")
+
+    if args.database:
+        from dbexport import apply_deltas
+        applied = apply_deltas(args.database, changed)
+        print(f"✅ {applied} deltas applied to {args.database}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
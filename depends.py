@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Dependency Index
+Version: 1.0.0
+Description: Builds a compact dependency graph from Packages.gz stanzas
+(Depends, Pre-Depends, Provides, Built-Using) with source->binary and
+reverse-dependency maps per release/architecture, and answers impact queries.
+"""
+
+import argparse
+import json
+import re
+from array import array
+from collections import deque
+
+from records import StringPool
+
+DEPENDENCY_FIELDS = ("Depends", "Pre-Depends")
+
+# Strip version constraints, arch restrictions, build profiles and ':any' qualifiers
+_RELATION_NOISE = re.compile(r"\([^)]*\)|\[[^\]]*\]|<[^>]*>")
+
+def parse_relations(value):
+    """Turn 'a (>= 1) | b:any, c' into the flat list of names ['a', 'b', 'c']."""
+    names = []
+    for alternative in _RELATION_NOISE.sub("", value).replace("|", ",").split(","):
+        name = alternative.strip().split(":")[0]
+        if name:
+            names.append(name)
+    return names
+
+def _field_values(lines):
+    """Collect the (possibly folded) values of the relation fields in a stanza."""
+    fields = {}
+    current = None
+    for line in lines:
+        if line[:1] in (" ", "\t"):
+            if current:
+                fields[current] += " " + line.strip()
+            continue
+        key, _, value = line.partition(":")
+        current = key if key in ("Package", "Source", "Architecture", "Provides", "Built-Using") + DEPENDENCY_FIELDS else None
+        if current:
+            fields[current] = value.strip()
+    return fields
+
+class Graph:
+    """Adjacency maps of one release/architecture, keyed by interned name ids."""
+    __slots__ = ("depends", "rdepends", "providers", "source_binaries", "built_using", "rbuilt_using")
+
+    def __init__(self):
+        self.depends = {}          # binary -> names it depends on
+        self.rdepends = {}         # name -> binaries depending on it (filled by finalize)
+        self.providers = {}        # virtual name -> binaries providing it
+        self.source_binaries = {}  # source -> binaries built from it
+        self.built_using = {}      # binary -> sources it was built using
+        self.rbuilt_using = {}     # source -> binaries built using it (filled by finalize)
+
+    def finalize(self):
+        rdepends = {}
+        for binary, targets in self.depends.items():
+            for target in targets:
+                rdepends.setdefault(target, array("I")).append(binary)
+                for provider in self.providers.get(target, ()):
+                    rdepends.setdefault(provider, array("I")).append(binary)
+        self.rdepends = {name: array("I", sorted(set(rows))) for name, rows in rdepends.items()}
+        rbuilt = {}
+        for binary, sources in self.built_using.items():
+            for source in sources:
+                rbuilt.setdefault(source, array("I")).append(binary)
+        self.rbuilt_using = rbuilt
+
+class DependencyIndex:
+    """Dependency graphs for every release/architecture seen while parsing."""
+
+    def __init__(self):
+        self.names = StringPool()
+        self.graphs = {}
+        self.closures = {}  # (key, name id) -> reverse_closure result; emptied by every change to the graphs
+
+    def graph(self, release, arch):
+        return self.graphs.setdefault(f"{release}/{arch}", Graph())
+
+    def add_stanza(self, lines, release, arch=None):
+        fields = _field_values(lines)
+        package = fields.get("Package")
+        if not package:
+            return
+        self.closures.clear()
+        graph = self.graph(release, arch or fields.get("Architecture", "all"))
+        names = self.names
+        binary = names.intern(package)
+        source = names.intern(fields.get("Source", package).split()[0])
+        graph.source_binaries.setdefault(source, array("I")).append(binary)
+
+        targets = array("I")
+        for field in DEPENDENCY_FIELDS:
+            if field in fields:
+                targets.extend(names.intern(name) for name in parse_relations(fields[field]))
+        if targets:
+            graph.depends[binary] = targets
+        if "Provides" in fields:
+            for name in parse_relations(fields["Provides"]):
+                graph.providers.setdefault(names.intern(name), array("I")).append(binary)
+        if "Built-Using" in fields:
+            graph.built_using[binary] = array("I", (names.intern(name) for name in parse_relations(fields["Built-Using"])))
+
+    def merge(self, other):
+        """Fold another (unfinalized) index into this one, remapping its name ids."""
+        self.closures.clear()
+        remap = [self.names.intern(name) for name in other.names.strings]
+        for key, theirs in other.graphs.items():
+            ours = self.graphs.setdefault(key, Graph())
+            for field in ("depends", "providers", "source_binaries", "built_using"):
+                mapping = getattr(ours, field)
+                for idx, values in getattr(theirs, field).items():
+                    mapping.setdefault(remap[idx], array("I")).extend(remap[v] for v in values)
+
+    def finalize(self):
+        for graph in self.graphs.values():
+            graph.finalize()
+        self.closures.clear()
+        return self
+
+    def reverse_closure(self, key, name_id):
+        """Every binary that transitively depends on name_id (breadth-first over rdepends)."""
+        cached = self.closures.get((key, name_id))
+        if cached is not None:
+            return cached
+        graph = self.graphs[key]
+        seen = set()
+        queue = deque([name_id])
+        while queue:
+            for binary in graph.rdepends.get(queue.popleft(), ()):
+                if binary not in seen:
+                    seen.add(binary)
+                    queue.append(binary)
+        seen.discard(name_id)
+        closure = self.closures[(key, name_id)] = frozenset(seen)
+        return closure
+
+    def _keys(self, release=None, arch=None):
+        for key in self.graphs:
+            rel, _, key_arch = key.partition("/")
+            if release in (None, rel) and arch in (None, key_arch):
+                yield key
+
+    def binaries_of(self, source, release=None, arch=None):
+        """Binaries built from a source package, per release/architecture."""
+        idx = self.names.ids.get(source)
+        result = {}
+        for key in self._keys(release, arch):
+            binaries = self.graphs[key].source_binaries.get(idx)
+            if binaries:
+                result[key] = sorted({self.names[b] for b in binaries})
+        return result
+
+    def rdepends_of(self, package, release=None, arch=None, transitive=False):
+        """Binaries depending on `package`, directly or (with transitive) at any depth."""
+        idx = self.names.ids.get(package)
+        result = {}
+        if idx is None:
+            return result
+        for key in self._keys(release, arch):
+            if transitive:
+                found = self.reverse_closure(key, idx)
+            else:
+                found = self.graphs[key].rdepends.get(idx, ())
+            if found:
+                result[key] = sorted(self.names[b] for b in found)
+        return result
+
+    def impact_of_source(self, source, release=None, arch=None):
+        """Binaries affected by an update of `source`: its own binaries, the binaries
+        built using it and everything that transitively depends on either."""
+        idx = self.names.ids.get(source)
+        result = {}
+        if idx is None:
+            return result
+        for key in self._keys(release, arch):
+            graph = self.graphs[key]
+            roots = set(graph.source_binaries.get(idx, ())) | set(graph.rbuilt_using.get(idx, ()))
+            affected = set(roots)
+            for root in roots:
+                affected |= self.reverse_closure(key, root)
+            if affected:
+                result[key] = sorted(self.names[b] for b in affected)
+        return result
+
+    def to_json(self):
+        def encode(mapping):
+            return {str(k): list(v) for k, v in mapping.items()}
+        return {
+            "names": self.names.strings[1:],
+            "graphs": {key: {"depends": encode(g.depends),
+                             "providers": encode(g.providers),
+                             "source_binaries": encode(g.source_binaries),
+                             "built_using": encode(g.built_using)}
+                       for key, g in self.graphs.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls()
+        for name in data["names"]:
+            index.names.intern(name)
+        for key, encoded in data["graphs"].items():
+            graph = Graph()
+            for field in ("depends", "providers", "source_binaries", "built_using"):
+                setattr(graph, field, {int(k): array("I", v) for k, v in encoded[field].items()})
+            index.graphs[key] = graph
+        return index.finalize()
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls.from_json(json.load(f))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the dependency index written by parser.py --deps-output')
+    parser.add_argument('-d', '--deps-file', required=True, help='Path to the dependency index JSON')
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--binaries', metavar='SOURCE', help='List binaries built from a source package')
+    query.add_argument('--rdepends', metavar='PACKAGE', help='List packages depending on a package')
+    query.add_argument('--impact', metavar='SOURCE', help='List binaries affected by an update of a source package')
+    parser.add_argument('-t', '--transitive', action='store_true', help='Follow reverse dependencies transitively')
+    parser.add_argument('-r', '--release', help='Limit to one release/suite')
+    parser.add_argument('-a', '--arch', help='Limit to one architecture')
+    args = parser.parse_args(argv)
+
+    index = DependencyIndex.load(args.deps_file)
+    if args.binaries:
+        result = index.binaries_of(args.binaries, args.release, args.arch)
+    elif args.rdepends:
+        result = index.rdepends_of(args.rdepends, args.release, args.arch, args.transitive)
+    else:
+        result = index.impact_of_source(args.impact, args.release, args.arch)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
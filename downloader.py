@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Index Download Planner
+Version: 1.0.0
+Description: Downloads the indexes listed in ubuntu_indexes.json to a local cache.
+Sizes from each suite's Release file are used to schedule the biggest files first;
+files are streamed to disk and interrupted downloads resume with HTTP Range requests.
+Requests go through the shared httpclient, which paces each host and retries
+throttled or failing responses; the retries here cover transfers cut off mid-body.
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+from httpclient import default_client, format_metrics
+from mirror import is_local, local_path
+
+CHUNK_SIZE = 1 << 16
+RETRIES = 5
+BACKOFF = 2
+TIMEOUT = (10, 60)  # connect, read
+
+class DownloadError(Exception):
+    pass
+
+def split_index_url(index_url, release):
+    """Split '<archive>/dists/<release>/main/binary-amd64/Packages.gz' into the Release URL and the path it lists."""
+    marker = f"/dists/{release}/"
+    if marker not in index_url:
+        return None, None
+    base, path = index_url.split(marker, 1)
+    return f"{base}{marker}Release", path
+
+def parse_release(text):
+    """Return {path: (size, sha256)} from the SHA256 section of a Release file."""
+    files = {}
+    in_sha256 = False
+    for line in text.splitlines():
+        if not line.startswith(" "):
+            in_sha256 = line.startswith("SHA256:")
+            continue
+        if in_sha256:
+            parts = line.split()
+            if len(parts) == 3:
+                files[parts[2]] = (int(parts[1]), parts[0])
+    return files
+
+def fetch_release_files(release_urls):
+    """Download each distinct Release file once; unreachable ones map to {}."""
+    releases = {}
+    for url in release_urls:
+        try:
+            response = default_client().get(url, timeout=TIMEOUT)
+            response.raise_for_status()
+            releases[url] = parse_release(response.text)
+        except requests.RequestException as e:
+            print(f"No Release file for sizing: {url} - {e}")
+            releases[url] = {}
+    return releases
+
+def plan_downloads(index_data):
+    """
+    Annotate each index entry with the size/sha256 listed in its Release file and
+    return them biggest first, so the slowest transfers start as early as possible.
+    """
+    release_urls = {}
+    planned = []
+    for entry in index_data:
+        release_url, path = (None, None) if is_local(entry['index_url']) else \
+            split_index_url(entry['index_url'], entry['release'])
+        if release_url:
+            release_urls.setdefault(release_url, []).append((entry, path))
+        else:
+            planned.append(dict(entry, expected_size=None, sha256=None))
+
+    for release_url, files in fetch_release_files(release_urls).items():
+        for entry, path in release_urls[release_url]:
+            size, sha256 = files.get(path, (None, None))
+            planned.append(dict(entry, expected_size=size, sha256=sha256))
+    return sorted(planned, key=lambda e: e['expected_size'] or 0, reverse=True)
+
+def cache_path(cache_dir, url):
+    parsed = urlparse(url)
+    return os.path.join(cache_dir, parsed.netloc, parsed.path.lstrip("/"))
+
+def _verify(path, expected_size, sha256):
+    if expected_size is not None and os.path.getsize(path) != expected_size:
+        return False
+    if sha256:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest() == sha256
+    return True
+
+def download(entry, cache_dir):
+    """
+    Stream one index into the cache and return its local path. A leftover .part
+    file is resumed with a Range request; a cached file matching the Release
+    checksum is reused. Raises DownloadError once retries are exhausted.
+    """
+    url = entry['index_url']
+    if is_local(url):
+        return local_path(url)
+
+    target = cache_path(cache_dir, url)
+    expected_size, sha256 = entry.get('expected_size'), entry.get('sha256')
+    if os.path.exists(target) and sha256 and _verify(target, expected_size, sha256):
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    part = target + ".part"
+
+    last_error = None
+    for attempt in range(RETRIES):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if expected_size is not None and offset >= expected_size:
+            offset = 0
+            os.remove(part)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        response = None
+        try:
+            with default_client().stream(url, headers=headers, timeout=TIMEOUT) as response:
+                if response.status_code == 416:
+                    os.remove(part)
+                    continue
+                if response.status_code == 404:
+                    raise DownloadError(f"not found: {url}")
+                response.raise_for_status()
+                mode = "ab" if offset and response.status_code == 206 else "wb"
+                with open(part, mode) as f:
+                    for block in response.iter_content(CHUNK_SIZE):
+                        f.write(block)
+            if _verify(part, expected_size, sha256):
+                os.replace(part, target)
+                return target
+            os.remove(part)
+            last_error = "size/checksum mismatch"
+        except (requests.RequestException, OSError) as e:
+            if response is None:
+                # The client already retried the request itself; only cut-off transfers are resumed here
+                raise DownloadError(f"giving up on {url}: {e}")
+            last_error = e
+        print(f"Attempt {attempt + 1} failed for {url}: {last_error}")
+        time.sleep(BACKOFF ** attempt)
+    raise DownloadError(f"giving up on {url}: {last_error}")
+
+def download_all(index_data, cache_dir, jobs=4):
+    """
+    Plan and run the downloads. Returns (entries, failures): entries keep the
+    order of index_data and carry a 'local_path' to read from, failures maps
+    index_url to the error message.
+    """
+    planned = plan_downloads(index_data)
+    paths = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(download, entry, cache_dir): entry for entry in planned}
+        for future in as_completed(futures):
+            url = futures[future]['index_url']
+            try:
+                paths[url] = future.result()
+            except DownloadError as e:
+                failures[url] = str(e)
+    metrics = default_client().metrics()
+    if metrics:
+        print(format_metrics(metrics))
+    entries = [dict(entry, local_path=paths[entry['index_url']])
+               for entry in index_data if entry['index_url'] in paths]
+    return entries, failures
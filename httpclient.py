@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Archive HTTP Client
+Version: 1.0.0
+Description: Shared HTTP layer for the crawlers, parsers and downloaders.
+Concurrency is limited per host and adjusted with AIMD: each healthy response
+adds about one slot per round trip, while 429/5xx responses, connection errors
+and inflated latency halve the limit (at most once per round trip). Retry-After
+is honored by pausing the whole host. Connections are pooled and reused, and
+per-host metrics are kept for reporting.
+
+With COPR_FIXTURE_SERVER set (see replay.py), requests are sent to that
+stand-in server instead, while limits and metrics stay keyed by the original host.
+
+A blocking client (requests) and an asyncio client (aiohttp) share the same
+controller, so threads and tasks are throttled the same way. Threads wait on the
+controller's condition; tasks wait in a FIFO of futures per host, and a release
+(from any thread) hands the freed slot to the next task on its own loop.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "copr/1.0 (+https://github.com/ubuntu/copr)"
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+RETRIES = 5
+BACKOFF = 1.0        # seconds, doubled per attempt with jitter
+MAX_BACKOFF = 60.0
+LATENCY_FACTOR = 3   # latency this many times the best seen counts as congestion...
+LATENCY_SLACK = 0.05 # ...once it is also this many seconds above it (see HostState.congested)
+TIMEOUT = (10, 60)   # connect, read
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FIXTURE_SERVER = os.environ.get("COPR_FIXTURE_SERVER", "").rstrip("/")
+
+def transport_url(url):
+    """The URL actually requested: the original, or its path on the fixture server."""
+    if not FIXTURE_SERVER:
+        return url
+    scheme, _, rest = url.partition("://")
+    return f"{FIXTURE_SERVER}/{scheme}/{rest}"
+
+def retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    return min(MAX_BACKOFF, BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+class HostState:
+    """AIMD concurrency limit and counters of one host. Callers hold the controller lock."""
+    __slots__ = ("limit", "in_flight", "pause_until", "best_latency", "latency", "last_decrease",
+                 "requests", "retries", "throttled", "server_errors", "failures", "peak_in_flight", "waiters")
+
+    def __init__(self, initial):
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.pause_until = 0.0
+        self.best_latency = None
+        self.latency = None          # EWMA of time to response headers
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.failures = 0
+        self.peak_in_flight = 0
+        self.waiters = deque()       # (loop, future) of tasks waiting for a slot, oldest first
+
+    def wait_time(self, now):
+        """0 when a request may start now, else how long to wait before checking again."""
+        if now < self.pause_until:
+            return self.pause_until - now
+        return 0.0 if self.in_flight < int(self.limit) else None
+
+    def start(self):
+        self.in_flight += 1
+        self.requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _decrease(self, now, minimum):
+        # One multiplicative decrease per round trip, however many requests saw the same congestion
+        if now - self.last_decrease >= (self.latency or 0.0):
+            self.limit = max(minimum, self.limit / 2)
+            self.last_decrease = now
+
+    def congested(self):
+        """
+        True when the smoothed latency is LATENCY_FACTOR times the best seen and
+        also LATENCY_SLACK seconds above it. On a LAN mirror or the fixture server
+        the best latency is ~1 ms, so the ratio alone would read a few ms of jitter
+        as congestion and keep halving the limit down to the minimum.
+        """
+        return (self.latency > LATENCY_FACTOR * self.best_latency
+                and self.latency - self.best_latency > LATENCY_SLACK)
+
+    def success(self, latency, minimum, maximum):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+        if self.congested():
+            self._decrease(time.monotonic(), minimum)
+        else:
+            self.limit = min(maximum, self.limit + 1 / self.limit)
+
+    def throttle(self, delay, minimum):
+        now = time.monotonic()
+        self._decrease(now, minimum)
+        if delay:
+            self.pause_until = max(self.pause_until, now + delay)
+
+    def error(self, minimum):
+        self._decrease(time.monotonic(), minimum)
+
+    def snapshot(self):
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "best_latency_ms": round(self.best_latency * 1000, 1) if self.best_latency is not None else None
+        }
+
+class Controller:
+    """Per-host AIMD limits shared by every client of the process."""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.hosts = {}
+        self.lock = threading.Condition()
+
+    def host(self, url):
+        netloc = urlparse(url).netloc
+        state = self.hosts.get(netloc)
+        if state is None:
+            state = self.hosts.setdefault(netloc, HostState(self.initial))
+        return state
+
+    def try_acquire(self, state):
+        """Take a slot if one is free; otherwise return how long to wait (None: until a release)."""
+        with self.lock:
+            wait = state.wait_time(time.monotonic())
+            if wait == 0.0:
+                state.start()
+            return wait
+
+    def acquire(self, state):
+        with self.lock:
+            while True:
+                wait = state.wait_time(time.monotonic())
+                if wait == 0.0:
+                    state.start()
+                    return
+                self.lock.wait(wait)
+
+    def try_acquire_async(self, state, loop):
+        """
+        Like try_acquire, but when the host is at its limit queue a future on `loop`
+        instead. Returns (wait, future): the future resolves to True once a slot has
+        been taken on the caller's behalf, or False when it should check again.
+        """
+        with self.lock:
+            wait = state.wait_time(time.monotonic())
+            if wait == 0.0 and not state.waiters:
+                state.start()
+                return 0.0, None
+            if wait:
+                return wait, None
+            future = loop.create_future()
+            state.waiters.append((loop, future))
+            self._wake(state)
+            return None, future
+
+    def cancel_waiter(self, state, future):
+        """Withdraw a task's future; a slot already handed to it is given back."""
+        with self.lock:
+            for waiter in state.waiters:
+                if waiter[1] is future:
+                    state.waiters.remove(waiter)
+                    return
+        if future.done() and not future.cancelled() and future.result():
+            self.release(state, "cancelled")
+
+    def _wake(self, state):
+        # Hand free slots to queued tasks in order; during a pause they are told to check again
+        while state.waiters:
+            wait = state.wait_time(time.monotonic())
+            if wait is None:
+                return
+            loop, future = state.waiters.popleft()
+            if wait == 0.0:
+                state.start()
+            try:
+                loop.call_soon_threadsafe(self._resolve, state, future, wait == 0.0)
+            except RuntimeError:  # the loop was closed; take the slot back
+                if wait == 0.0:
+                    state.in_flight -= 1
+
+    def _resolve(self, state, future, granted):
+        if future.done():  # the task was cancelled while the slot was on its way
+            if granted:
+                self.release(state, "cancelled")
+            return
+        future.set_result(granted)
+
+    def release(self, state, outcome, latency=None, delay=None, retrying=False):
+        """
+        outcome: 'ok', 'throttled', 'server_error', 'error', or 'cancelled' when the
+        caller abandoned the response for its own reasons (no adjustment).
+        """
+        with self.lock:
+            state.in_flight -= 1
+            if retrying:
+                state.retries += 1
+            elif outcome != "ok" and outcome != "cancelled":
+                state.failures += 1
+            if outcome == "ok":
+                state.success(latency, self.minimum, self.maximum)
+            elif outcome == "throttled":
+                state.throttled += 1
+                state.throttle(delay, self.minimum)
+            elif outcome == "server_error":
+                state.server_errors += 1
+                state.throttle(delay, self.minimum)
+            elif outcome == "error":
+                state.error(self.minimum)
+            self._wake(state)
+            self.lock.notify_all()
+
+    def metrics(self):
+        with self.lock:
+            return {host: state.snapshot() for host, state in sorted(self.hosts.items())}
+
+def _outcome(status):
+    if status == 429:
+        return "throttled"
+    if status in RETRY_STATUSES:
+        return "server_error"
+    return "ok"
+
+class HttpClient:
+    """
+    Blocking client over one pooled requests.Session.
+
+    Usage:
+        client = default_client()
+        response = client.get(url)             # retried, body read, slot released
+        with client.stream(url) as response:   # slot held while the body is read
+            for block in response.iter_content(1 << 16): ...
+    """
+
+    def __init__(self, controller=None, retries=RETRIES, timeout=TIMEOUT):
+        self.controller = controller or shared_controller()
+        self.retries = retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.controller.maximum)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    @contextmanager
+    def stream(self, url, method="GET", **kwargs):
+        """Yield the first non-retryable response, holding the host slot until the block exits."""
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("stream", True)
+        state = self.controller.host(url)
+        for attempt in range(self.retries + 1):
+            self.controller.acquire(state)
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, transport_url(url), **kwargs)
+            except requests.RequestException:
+                retrying = attempt < self.retries
+                self.controller.release(state, "error", retrying=retrying)
+                if not retrying:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            outcome = _outcome(response.status_code)
+            if outcome != "ok" and attempt < self.retries:
+                delay = retry_after(response.headers.get("Retry-After"))
+                response.close()
+                self.controller.release(state, outcome, delay=delay, retrying=True)
+                if not delay:  # with Retry-After, acquire() waits out the host pause
+                    time.sleep(backoff_delay(attempt))
+                continue
+
+            latency = time.monotonic() - start
+            final = "cancelled"
+            try:
+                with response:
+                    yield response
+                final = outcome
+            except (requests.RequestException, OSError):
+                final = "error"
+                raise
+            finally:
+                self.controller.release(state, final, latency=latency)
+            return
+
+    def request(self, method, url, **kwargs):
+        """Send a request with retries and return the response with its body loaded."""
+        with self.stream(url, method=method, **kwargs) as response:
+            response.content
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, **kwargs)
+
+    def metrics(self):
+        return self.controller.metrics()
+
+class AsyncHttpClient:
+    """
+    asyncio client over one aiohttp.ClientSession, throttled by the same controller.
+
+    Usage:
+        async with AsyncHttpClient() as client:
+            status, text = await client.get_text(url)
+    """
+
+    def __init__(self, controller=None, retries=RETRIES, timeout=TIMEOUT):
+        import aiohttp
+        self.aiohttp = aiohttp
+        self.controller = controller or shared_controller()
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(connect=timeout[0], sock_read=timeout[1])
+        self.session = None
+
+    async def __aenter__(self):
+        connector = self.aiohttp.TCPConnector(limit=0, limit_per_host=self.controller.maximum)
+        self.session = self.aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                  headers={"User-Agent": USER_AGENT})
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _acquire(self, state):
+        loop = asyncio.get_running_loop()
+        while True:
+            wait, future = self.controller.try_acquire_async(state, loop)
+            if wait == 0.0:
+                return
+            if future is None:  # the host is paused (Retry-After)
+                await asyncio.sleep(wait)
+                continue
+            try:
+                if await future:
+                    return
+            except asyncio.CancelledError:
+                self.controller.cancel_waiter(state, future)
+                raise
+
+    @asynccontextmanager
+    async def stream(self, url, method="GET", **kwargs):
+        """Yield the first non-retryable response, holding the host slot until the block exits."""
+        state = self.controller.host(url)
+        for attempt in range(self.retries + 1):
+            await self._acquire(state)
+            start = time.monotonic()
+            try:
+                response = await self.session.request(method, transport_url(url), **kwargs)
+            except (self.aiohttp.ClientError, asyncio.TimeoutError):
+                retrying = attempt < self.retries
+                self.controller.release(state, "error", retrying=retrying)
+                if not retrying:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            outcome = _outcome(response.status)
+            if outcome != "ok" and attempt < self.retries:
+                delay = retry_after(response.headers.get("Retry-After"))
+                response.release()
+                self.controller.release(state, outcome, delay=delay, retrying=True)
+                if not delay:
+                    await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            latency = time.monotonic() - start
+            final = "cancelled"
+            try:
+                async with response:
+                    yield response
+                final = outcome
+            except (self.aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                final = "error"
+                raise
+            finally:
+                self.controller.release(state, final, latency=latency)
+            return
+
+    async def get_text(self, url, **kwargs):
+        """GET with retries; returns (status, body text)."""
+        async with self.stream(url, **kwargs) as response:
+            return response.status, await response.text()
+
+    def metrics(self):
+        return self.controller.metrics()
+
+_controller = None
+_client = None
+_init_lock = threading.Lock()
+
+def shared_controller():
+    global _controller
+    with _init_lock:
+        if _controller is None:
+            _controller = Controller()
+        return _controller
+
+def default_client():
+    """The process-wide blocking client, so every module shares one connection pool."""
+    global _client
+    if _client is None:
+        client = HttpClient()
+        with _init_lock:
+            if _client is None:
+                _client = client
+    return _client
+
+def format_metrics(metrics):
+    lines = []
+    for host, m in metrics.items():
+        lines.append(f"{host}: {m['requests']} requests, {m['retries']} retries, {m['throttled']} throttled, "
+                     f"{m['server_errors']} 5xx, {m['failures']} failed, limit {m['limit']} "
+                     f"(peak {m['peak_in_flight']} in flight), latency {m['latency_ms']} ms")
+    return "\n".join(lines)
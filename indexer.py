@@ -2,11 +2,11 @@
 # Ubuntu Repository Indexer
 # Revision: 1.0.3
 
-import requests
 import json
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+import sys
 import argparse
+from httpclient import default_client
+from mirror import discover_indexes
 
 ARCHIVE_URLS = [
     "https://archive.ubuntu.com/ubuntu",
@@ -28,13 +28,10 @@ ARCHIVE_URLS = [
 
 headers = {'User-Agent': 'Ubuntu-Indexer/1.0'}
 
-parser = argparse.ArgumentParser(description='Ubuntu repository indexer')
-parser.add_argument('-o', '--output', default='ubuntu_indexes.json', help='Output JSON filename')
-args = parser.parse_args()
-
 # Fetch available releases (suites) from archive
 def get_available_releases():
-    response = requests.get("https://archive.ubuntu.com/ubuntu/dists/", headers=headers)
+    from bs4 import BeautifulSoup
+    response = default_client().get("https://archive.ubuntu.com/ubuntu/dists/", headers=headers)
     response.raise_for_status()
     soup = BeautifulSoup(response.text, 'html.parser')
     releases = [a['href'].strip('/') for a in soup.find_all('a', href=True)
@@ -43,8 +40,9 @@ def get_available_releases():
 
 # Fetch available architectures dynamically
 def get_available_architectures(archive_url, suite, component):
+    from bs4 import BeautifulSoup
     comp_url = f"{archive_url}/dists/{suite}/{component}/"
-    response = requests.get(comp_url, headers=headers)
+    response = default_client().get(comp_url, headers=headers)
     if response.status_code != 200:
         return []
     soup = BeautifulSoup(response.text, 'html.parser')
@@ -52,31 +50,52 @@ def get_available_architectures(archive_url, suite, component):
                      if a['href'].startswith('binary-') or a['href'].startswith('source')]
     return architectures
 
-releases = get_available_releases()
-index_urls = []
+# Crawl every archive for its Packages.gz/Sources.gz indexes
+def crawl_indexes():
+    releases = get_available_releases()
+    index_urls = []
+
+    for archive_url in ARCHIVE_URLS:
+        for release in releases:
+            for component in ["main", "universe", "multiverse", "restricted"]:
+                suite_url = f"{archive_url}/dists/{release}/{component}/"
+                response = default_client().get(suite_url, headers=headers)
+                if response.status_code != 200:
+                    continue
+                architectures = get_available_architectures(archive_url, release, component)
+                for arch in architectures:
+                    index_file = "Packages.gz" if arch != "source" else "Sources.gz"
+                    index_url = f"{suite_url}{arch}/{index_file}"
+                    print(f"Adding: {index_url}")
+                    index_urls.append({
+                        "archive_url": archive_url,
+                        "release": release,
+                        "component": component,
+                        "architecture": arch,
+                        "index_url": index_url
+                    })
+    return index_urls
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Ubuntu repository indexer')
+    parser.add_argument('-o', '--output', default='ubuntu_indexes.json', help='Output JSON filename')
+    parser.add_argument('-m', '--mirror', help='Index a local apt mirror from its dists/ tree instead of crawling')
+    return parser
 
-for archive_url in ARCHIVE_URLS:
-    for release in releases:
-        for component in ["main", "universe", "multiverse", "restricted"]:
-            suite_url = f"{archive_url}/dists/{release}/{component}/"
-            response = requests.get(suite_url, headers=headers)
-            if response.status_code != 200:
-                continue
-            architectures = get_available_architectures(archive_url, release, component)
-            for arch in architectures:
-                index_file = "Packages.gz" if arch != "source" else "Sources.gz"
-                index_url = f"{suite_url}{arch}/{index_file}"
-                print(f"Adding: {index_url}")
-                index_urls.append({
-                    "archive_url": archive_url,
-                    "release": release,
-                    "component": component,
-                    "architecture": arch,
-                    "index_url": index_url
-                })
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.mirror:
+        index_urls = discover_indexes(args.mirror)
+        for entry in index_urls:
+            print(f"Adding: {entry['index_url']}")
+    else:
+        index_urls = crawl_indexes()
 
-with open(args.output, "w") as f:
-    json.dump(index_urls, f, indent=2)
+    with open(args.output, "w") as f:
+        json.dump(index_urls, f, indent=2)
 
-print(f"Index URLs saved to {args.output}")
+    print(f"Index URLs saved to {args.output}")
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
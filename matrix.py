@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Package Availability Matrix
+Version: 1.0.0
+Description: Answers "which releases and architectures carry package X" for the
+whole archive within a fixed memory budget. While the indexes are parsed,
+(package, release/architecture, version) rows are collected up to the budget,
+sorted and spilled to disk as runs; the runs are then k-way merged (heapq) into
+one file with a release x architecture bitmap per package. A sparse index of
+every BLOCK-th package lets a lookup read a single block of the file.
+
+Matrix file: one JSON header line ({"format", "version", "columns", "packages",
+"rows", "block", "index": [[package, offset], ...]}), then one line per package in
+sorted order: package<TAB>bitmap (hex)<TAB>version=bitmap;... - each distinct
+version with the columns that carry it. Runs use the same line format, so
+merging is the same operation at every level.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+from bisect import bisect_right
+
+from debversion import sort_key
+
+FORMAT = "copr-matrix"
+VERSION = 1
+MEMORY_BUDGET = 256  # MiB of rows held before a run is spilled
+ROW_BYTES = 200      # rough in-memory cost of one (package, column, version) row
+MAX_FANIN = 64       # runs merged at once; more runs are merged in several passes
+BLOCK = 128          # packages per sparse-index block
+
+def format_line(package, bitmap, versions):
+    encoded = ";".join(f"{version}={mask:x}" for version, mask in sorted(versions.items()))
+    return f"{package}\t{bitmap:x}\t{encoded}\n"
+
+def parse_line(line):
+    package, bitmap, encoded = line.rstrip("\n").split("\t")
+    versions = {}
+    for item in encoded.split(";") if encoded else ():
+        version, _, mask = item.rpartition("=")
+        versions[version] = int(mask, 16)
+    return package, int(bitmap, 16), versions
+
+def combine(records):
+    """OR together the records of one package (package, bitmap, versions)."""
+    package = None
+    bitmap = 0
+    versions = {}
+    for package, mask, record_versions in records:
+        bitmap |= mask
+        for version, version_mask in record_versions.items():
+            versions[version] = versions.get(version, 0) | version_mask
+    return package, bitmap, versions
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield parse_line(line)
+
+def merge(paths):
+    """k-way merge sorted runs into one sorted stream of combined records."""
+    streams = [_read_run(path) for path in paths]
+    merged = heapq.merge(*streams, key=lambda record: record[0])
+    for _, records in itertools.groupby(merged, key=lambda record: record[0]):
+        yield combine(records)
+
+class MatrixBuilder:
+    """Collects rows while the indexes are read, spilling sorted runs under the memory budget."""
+
+    def __init__(self, memory_mb=MEMORY_BUDGET, tmp_dir=None):
+        self.columns = []
+        self.column_ids = {}
+        self.current = None
+        self.rows = []
+        self.max_rows = max(1024, (memory_mb << 20) // ROW_BYTES)
+        self.work_dir = tempfile.mkdtemp(prefix="copr-matrix-", dir=tmp_dir)
+        self.runs = []
+        self.row_count = 0
+
+    def select(self, release, architecture):
+        """Set the release/architecture of the rows added next."""
+        column = (release, architecture.replace("binary-", ""))
+        if column not in self.column_ids:
+            self.column_ids[column] = len(self.columns)
+            self.columns.append(column)
+        self.current = self.column_ids[column]
+
+    def add(self, package, version):
+        self.rows.append((package, self.current, version))
+        self.row_count += 1
+        if len(self.rows) >= self.max_rows:
+            self.spill()
+
+    def spill(self):
+        if not self.rows:
+            return
+        self.rows.sort()
+        path = os.path.join(self.work_dir, f"run-{len(self.runs):05d}")
+        with open(path, "w", encoding="utf-8") as f:
+            for package, rows in itertools.groupby(self.rows, key=lambda row: row[0]):
+                bitmap = 0
+                versions = {}
+                for _, column, version in rows:
+                    bit = 1 << column
+                    bitmap |= bit
+                    versions[version] = versions.get(version, 0) | bit
+                f.write(format_line(package, bitmap, versions))
+        self.rows = []
+        self.runs.append(path)
+
+    def _merge_passes(self):
+        """Merge runs MAX_FANIN at a time until one final merge can open them all."""
+        generation = 0
+        while len(self.runs) > MAX_FANIN:
+            merged = []
+            for start in range(0, len(self.runs), MAX_FANIN):
+                group = self.runs[start:start + MAX_FANIN]
+                path = os.path.join(self.work_dir, f"pass{generation}-{start // MAX_FANIN:05d}")
+                with open(path, "w", encoding="utf-8") as f:
+                    for record in merge(group):
+                        f.write(format_line(*record))
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            self.runs = merged
+            generation += 1
+
+    def save(self, path):
+        """Merge everything into the matrix file at `path`; returns the number of packages."""
+        try:
+            self.spill()
+            self._merge_passes()
+            body = path + ".body"
+            index = []
+            count = 0
+            with open(body, "wb") as f:
+                for package, bitmap, versions in merge(self.runs):
+                    if count % BLOCK == 0:
+                        index.append([package, f.tell()])
+                    f.write(format_line(package, bitmap, versions).encode("utf-8"))
+                    count += 1
+            header = {
+                "format": FORMAT,
+                "version": VERSION,
+                "columns": self.columns,
+                "packages": count,
+                "rows": self.row_count,
+                "block": BLOCK,
+                "index": index
+            }
+            with open(path + ".tmp", "wb") as out, open(body, "rb") as f:
+                out.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+                shutil.copyfileobj(f, out, 1 << 20)
+            os.replace(path + ".tmp", path)
+            os.remove(body)
+            return count
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+class PackageMatrix:
+    """Read side: loads the header and sparse index, then reads one block per lookup."""
+
+    def __init__(self, path, header, data_start):
+        self.path = path
+        self.columns = [tuple(column) for column in header["columns"]]
+        self.package_count = header["packages"]
+        self.keys = [package for package, _ in header["index"]]
+        self.offsets = [offset + data_start for _, offset in header["index"]]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            data_start = f.tell()
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a package matrix")
+        return cls(path, header, data_start)
+
+    def record(self, package):
+        """(bitmap, {version: bitmap}) for a package, or None."""
+        block = bisect_right(self.keys, package) - 1
+        if block < 0:
+            return None
+        end = self.offsets[block + 1] if block + 1 < len(self.offsets) else None
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[block])
+            data = f.read(end - self.offsets[block]) if end is not None else f.read()
+        for line in data.decode("utf-8").splitlines():
+            name, _, rest = line.partition("\t")
+            if name == package:
+                _, bitmap, versions = parse_line(line)
+                return bitmap, versions
+            if name > package:
+                break
+        return None
+
+    def lookup(self, package):
+        """{release: {architecture: version}} for every column that carries the package."""
+        record = self.record(package)
+        if record is None:
+            return None
+        result = {}
+        # Highest version last, so it wins where a column lists several
+        for version, mask in sorted(record[1].items(), key=lambda item: sort_key(item[0])):
+            for bit, (release, arch) in enumerate(self.columns):
+                if mask >> bit & 1:
+                    result.setdefault(release, {})[arch] = version
+        return {release: dict(sorted(arches.items())) for release, arches in sorted(result.items())}
+
+    def __iter__(self):
+        """Yield (package, bitmap, versions) for every package in order."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                yield parse_line(line)
+
+def add_index(builder, location, release, architecture):
+    """Stream one Packages index into the builder; rows are staged until the whole
+    index has been read, so a truncated index adds nothing."""
+    from mirror import iter_stanzas, open_index
+    staged = []
+    with open_index(location) as stream:
+        for lines in iter_stanzas(stream):
+            package = version = None
+            for line in lines:
+                if line.startswith("Package: "):
+                    package = line[9:]
+                elif line.startswith("Version: "):
+                    version = line[9:]
+            if package and version:
+                staged.append((package, version))
+    builder.select(release, architecture)
+    for package, version in staged:
+        builder.add(package, version)
+    return len(staged)
+
+def add_records(builder, records):
+    """Add parser.py output records (they carry release, architecture, package and version)."""
+    for record in records:
+        if record.get("architecture") in (None, "source"):
+            continue
+        builder.select(record.get("release"), record["architecture"])
+        version = f"{record['epoch']}:{record['version']}" if record.get("epoch") else record["version"]
+        builder.add(record["package"], version)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Package x release x architecture availability matrix')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Build the matrix within a memory budget')
+    source_group = build.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('-i', '--index-file', help='Path to ubuntu_indexes.json')
+    source_group.add_argument('-m', '--mirror', help='Path to a local apt mirror; indexes are discovered from its dists/ tree')
+    source_group.add_argument('-p', '--packages', help='Parsed packages (parser.py output: JSON list, streamed record by record, or --jsonl-dir shard directory)')
+    build.add_argument('-o', '--output', default='package_matrix.tsv', help='Matrix file to write')
+    build.add_argument('-M', '--memory', type=int, default=MEMORY_BUDGET, help='Memory budget for buffered rows, in MiB')
+    build.add_argument('-T', '--tmp-dir', help='Directory for the sorted runs (default: system temp)')
+    build.add_argument('-c', '--cache-dir', default='index_cache', help='Directory for downloaded indexes (partial downloads are resumed)')
+    build.add_argument('-j', '--jobs', type=int, default=4, help='Number of concurrent downloads')
+    build.add_argument('-s', '--suite', action='append', help='Only include this suite (repeatable)')
+    lookup = sub.add_parser('lookup', help='Releases and architectures carrying each package')
+    lookup.add_argument('-x', '--matrix', default='package_matrix.tsv', help='Matrix file written by build')
+    lookup.add_argument('packages', nargs='+', help='Package names')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'lookup':
+        matrix = PackageMatrix.load(args.matrix)
+        print(json.dumps({package: matrix.lookup(package) for package in args.packages}, indent=2))
+        return 0
+
+    builder = MatrixBuilder(args.memory, args.tmp_dir)
+    if args.packages:
+        from dbexport import load_packages
+        add_records(builder, (record for record in load_packages(args.packages)
+                              if not args.suite or record.get("release") in args.suite))
+    else:
+        from downloader import download_all
+        from mirror import discover_indexes
+        if args.mirror:
+            index_data = discover_indexes(args.mirror)
+        else:
+            with open(args.index_file, "r") as f:
+                index_data = json.load(f)
+        index_data = [entry for entry in index_data if entry['architecture'] != "source"
+                      and (not args.suite or entry['release'] in args.suite)]
+        entries, failures = download_all(index_data, args.cache_dir, args.jobs)
+        for entry in entries:
+            print(f"Processing: {entry['index_url']}")
+            try:
+                add_index(builder, entry['local_path'], entry['release'], entry['architecture'])
+            except (OSError, EOFError) as e:
+                print(f"Failed to read index: {entry['index_url']} - {e}")
+        for url, error in failures.items():
+            print(f"Failed to fetch {url}: {error}")
+
+    runs = len(builder.runs) + bool(builder.rows)
+    count = builder.save(args.output)
+    print(f"✅ {count} packages x {len(builder.columns)} release/architecture columns "
+          f"({builder.row_count} rows, {runs} sorted runs) saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Local Mirror Access
+Version: 1.0.0
+Description: Opens Packages/Sources indexes from HTTP or a local apt mirror tree
+and discovers suites, components and architectures from the mirror's dists/ layout.
+"""
+
+import gzip
+import io
+import lzma
+import mmap
+import os
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
+from urllib.request import pathname2url
+
+# Index file names in order of preference when a mirror carries several
+INDEX_NAMES = {
+    "packages": ["Packages.gz", "Packages.xz", "Packages"],
+    "sources": ["Sources.gz", "Sources.xz", "Sources"],
+}
+
+def is_local(location):
+    """True for file:// URIs and plain filesystem paths."""
+    return not location.startswith(("http://", "https://"))
+
+def local_path(location):
+    """Turn a file:// URI or plain path into a filesystem path."""
+    if location.startswith("file://"):
+        return unquote(urlparse(location).path)
+    return location
+
+def file_uri(path):
+    return "file://" + pathname2url(os.path.abspath(path))
+
+def _decompress(location, raw):
+    """Wrap a raw binary stream with the decompressor matching the file name."""
+    name = urlparse(location).path if not is_local(location) else local_path(location)
+    if name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=raw)
+    if name.endswith(".xz"):
+        return lzma.LZMAFile(raw)
+    return raw
+
+@contextmanager
+def open_index(location, timeout=10):
+    """
+    Yield a decompressed binary stream for an index.
+    Local files are memory-mapped and HTTP responses are streamed, so the
+    compressed data is never copied into an intermediate buffer.
+    """
+    if is_local(location):
+        with open(local_path(location), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield io.BytesIO()
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield _decompress(location, mapped)
+    else:
+        from httpclient import default_client
+        with default_client().stream(location, timeout=timeout) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield _decompress(location, response.raw)
+
+def iter_stanzas(stream):
+    """Yield each stanza of a deb822 stream as a list of lines."""
+    stanza = []
+    for raw in iter(stream.readline, b""):
+        line = raw.decode("utf-8", "replace").rstrip("\n")
+        if line.strip():
+            stanza.append(line)
+        elif stanza:
+            yield stanza
+            stanza = []
+    if stanza:
+        yield stanza
+
+def _find_index(directory, kind):
+    for name in INDEX_NAMES[kind]:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _subdirs(path):
+    try:
+        return sorted(d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d)))
+    except OSError:
+        return []
+
+def discover_suites(mirror_root):
+    """List the suites found under <mirror_root>/dists."""
+    return _subdirs(os.path.join(local_path(mirror_root), "dists"))
+
+def discover_indexes(mirror_root):
+    """
+    Walk <mirror_root>/dists/<suite>/<component>/<binary-*|source> and return
+    entries in the same shape as ubuntu_indexes.json.
+    """
+    root = local_path(mirror_root)
+    archive_url = file_uri(root)
+    entries = []
+    for suite in discover_suites(root):
+        suite_dir = os.path.join(root, "dists", suite)
+        for component in _subdirs(suite_dir):
+            comp_dir = os.path.join(suite_dir, component)
+            for arch in _subdirs(comp_dir):
+                if arch.startswith("binary-"):
+                    index_path = _find_index(os.path.join(comp_dir, arch), "packages")
+                elif arch == "source":
+                    index_path = _find_index(os.path.join(comp_dir, arch), "sources")
+                else:
+                    continue
+                if not index_path:
+                    continue
+                entries.append({
+                    "archive_url": archive_url,
+                    "release": suite,
+                    "component": component,
+                    "architecture": arch,
+                    "index_url": file_uri(index_path)
+                })
+    return entries
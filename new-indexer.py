@@ -10,22 +10,17 @@ from bs4 import BeautifulSoup
 import json
 import argparse
 from datetime import datetime
-from requests.adapters import HTTPAdapter, Retry
+from httpclient import default_client
 
 SCRIPT_VERSION = "1.1.0"
 
-# Configure HTTP session with retries
-session = requests.Session()
-retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-session.mount('https://', HTTPAdapter(max_retries=retries))
-
 def log(msg, verbose=False):
     if verbose:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
 
 def get_suites(dist_url, verbose=False):
     try:
-        response = session.get(dist_url, timeout=10)
+        response = default_client().get(dist_url, timeout=10)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         return [link.get('href').rstrip('/') for link in soup.find_all('a')
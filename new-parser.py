@@ -11,22 +11,18 @@ import re
 import argparse
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from requests.adapters import HTTPAdapter, Retry
+from httpclient import MAX_CONCURRENCY, default_client, format_metrics
+from shards import ShardedWriter
 
 SCRIPT_VERSION = "1.1.0"
 
-# Configure HTTP session with retries
-session = requests.Session()
-retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-session.mount('https://', HTTPAdapter(max_retries=retries))
-
 def log(msg, verbose=False):
     if verbose:
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
 
 def fetch_text(url, verbose=False):
     try:
-        response = session.get(url, timeout=10)
+        response = default_client().get(url, timeout=10)
         response.raise_for_status()
         log(f"✔️ Fetched: {url}", verbose)
         return response.text
@@ -70,13 +66,26 @@ def main():
     parser.add_argument('-i', '--index-file', required=True, help='Path to ubuntu_repos.json')
     parser.add_argument('-o', '--output', default='ubuntu_packages.json', help='Output JSON filename')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose mode')
+    parser.add_argument('--jsonl-dir', help='Stream gzip JSON Lines shards per release/component plus a manifest to this directory')
     args = parser.parse_args()
 
     with open(args.index_file, 'r') as f:
         index_data = json.load(f).get("indexes", [])
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
+    if args.jsonl_dir:
+        metadata = {"generator": "new-parser.py", "script_version": SCRIPT_VERSION}
+        # The client paces each host; the pool only needs enough threads to fill its limit
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor, \
+                ShardedWriter(args.jsonl_dir, metadata=metadata) as writer:
+            results = executor.map(lambda entry: process_entry(entry, args.verbose), index_data)
+            for entry, result in zip(index_data, results):
+                writer.write(result, key=(entry.get("release"), entry.get("component")))
+        print(f"✅ Data successfully written to {args.jsonl_dir}")
+        return
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
         results = list(executor.map(lambda entry: process_entry(entry, args.verbose), index_data))
+    log(format_metrics(default_client().metrics()), args.verbose)
 
     output_data = {
         "generated_at": datetime.now().isoformat(),
@@ -3,9 +3,8 @@
 # Tracks Ubuntu repository growth and generates visualizations for key insights.
 
 import json
-import matplotlib.pyplot as plt
-import numpy as np
 import os
+import sys
 import argparse
 
 # === Load Data ===
@@ -19,6 +18,7 @@ def load_data(file_path):
 
 # === Graph: Total Package Counts by Release ===
 def plot_total_packages(data, output_dir):
+    import matplotlib.pyplot as plt
     releases = []
     package_counts = []
 
@@ -44,6 +44,8 @@ def plot_total_packages(data, output_dir):
 
 # === Graph: Repository Growth Trends ===
 def plot_growth_trends(data, output_dir):
+    import matplotlib.pyplot as plt
+    import numpy as np
     pockets = ["release", "updates", "security", "backports", "proposed"]
     sizes = {pocket: [] for pocket in pockets}
 
@@ -75,6 +77,7 @@ def plot_growth_trends(data, output_dir):
 
 # === Graph: Top 10 Largest Packages ===
 def plot_top10_packages(data, output_dir):
+    import matplotlib.pyplot as plt
     package_sizes = {}
     
     for repo, releases_data in data.items():
@@ -98,12 +101,12 @@ def plot_top10_packages(data, output_dir):
     plt.close()
 
 # === Main Program ===
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Track Ubuntu repository growth and visualize key insights.')
     parser.add_argument('-f', '--file', required=True, help='Path to the JSON data file (e.g., ubuntu_reposize.json)')
     parser.add_argument('-o', '--output', required=True, help='Directory to save generated charts')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if not os.path.exists(args.output):
         os.makedirs(args.output)
@@ -111,7 +114,7 @@ def main():
     data = load_data(args.file)
     if not data:
         print("No valid data found. Exiting...")
-        return
+        return 1
 
     # Generate Charts
     plot_total_packages(data, args.output)
@@ -119,7 +122,8 @@ def main():
     plot_top10_packages(data, args.output)
 
     print(f"Visualizations saved in: {args.output}")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
@@ -3,106 +3,140 @@
 # Revision: 1.0.3
 # Fix: Handle missing 'Package' field gracefully and skip invalid files
 
-import gzip
 import requests
 import json
 import sys
-from io import BytesIO
 import argparse
-import concurrent.futures
+import os
+from mirror import open_index, iter_stanzas, discover_indexes
+from records import PackageTable
+from depends import DependencyIndex
+from downloader import download_all
+import chunked
+from shards import ShardedWriter
 
-# Argument parsing
-parser = argparse.ArgumentParser(description='Parse Ubuntu Packages.gz files')
-parser.add_argument('url', nargs='?', help='URL of the Packages.gz file')
-parser.add_argument('-i', '--index-file', help='Path to ubuntu_indexes.json to process multiple indexes')
-parser.add_argument('-o', '--output', default='ubuntu_packages.json', help='Output JSON filename')
-parser.add_argument('--stdout', action='store_true', help='Output JSON to stdout instead of file')
-parser.add_argument('--validate', action='store_true', help='Validate URLs')
-
-args = parser.parse_args()
-
-# Function to process a single Packages.gz file
-def process_packages_gz(url, release):
+# Function to process a single Packages.gz file into the package table
+def process_packages_gz(url, release, component, table, architecture=None, deps=None, executor=None, parts=16):
+    added = 0
+    start = len(table)
+    # Dependencies are collected apart and merged once the whole index was read, so a
+    # failed read leaves nothing behind in `deps`, just as the table is truncated
+    index_deps = DependencyIndex() if deps is not None else None
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        if len(response.content) == 0:
-            print(f"Skipping empty file: {url}")
-            return []
-        
-        with gzip.open(BytesIO(response.content), 'rt', encoding='utf-8') as f:
-            packages_data = f.read()
-        
-        if not packages_data.strip():
-            print(f"Skipping zero-byte or unreadable file: {url}")
-            return []
-    except requests.RequestException as e:
+        with open_index(url) as stream:
+            if executor is not None:
+                data = stream.read()
+            else:
+                for lines in iter_stanzas(stream):
+                    if table.append_stanza(lines, release, component, architecture):
+                        added += 1
+                        if index_deps is not None:
+                            index_deps.add_stanza(lines, release, architecture)
+        if executor is not None:
+            added = process_packages_data(data, release, component, table, architecture, index_deps, executor, parts)
+    except (requests.RequestException, OSError, EOFError) as e:
         print(f"Skipping due to download error: {url} - {e}")
-        return []
-    
-    packages = packages_data.strip().split("\n\n")
-    parsed_packages = []
-    
-    for pkg in packages:
-        pkg_dict = {"release": release}  # Include release info
-        lines = pkg.strip().split("\n")
-        for line in lines:
-            if line.startswith("Package: "):
-                pkg_dict["package"] = line.split("Package: ")[1]
-            elif line.startswith("Version: "):
-                version = line.split("Version: ")[1]
-                pkg_dict["version"] = version.split(":")[-1]
-            elif line.startswith("Source: "):
-                pkg_dict["source"] = line.split("Source: ")[1].split()[0]
-            elif line.startswith("Section: "):
-                pkg_dict["section"] = line.split("Section: ")[1]
-            elif line.startswith("Maintainer: "):
-                pkg_dict["maintainer"] = line.split("Maintainer: ")[1]
-            elif line.startswith("Size: "):
-                pkg_dict["size"] = int(line.split("Size: ")[1])
-        
-        # Ensure 'package' field exists before setting default source
-        if "package" not in pkg_dict:
-            print(f"Skipping entry with missing 'Package' field: {pkg_dict}")
-            continue
-        
-        pkg_dict.setdefault("source", pkg_dict["package"])
-        
-        if "package" in pkg_dict and "version" in pkg_dict:
-            version_clean = pkg_dict['version'].split(":")[-1]
-            source_initial = pkg_dict["source"][:4] if pkg_dict["source"].startswith("lib") else pkg_dict["source"][0]
-            base_url = f"https://changelogs.ubuntu.com/changelogs/pool/main/{source_initial}/{pkg_dict['source']}/{pkg_dict['source']}_{version_clean}"
-            pkg_dict["copyright"] = f"{base_url}/copyright"
-            pkg_dict["changelog"] = f"{base_url}/changelog"
-            parsed_packages.append(pkg_dict)
-    
-    return parsed_packages
+        table.truncate(start)
+        return 0
+    if deps is not None:
+        deps.merge(index_deps)
+
+    if not added:
+        print(f"Skipping zero-byte or unreadable file: {url}")
+    return added
+
+# Large indexes are split at stanza boundaries and parsed on the process pool
+def process_packages_data(data, release, component, table, architecture, deps, executor, parts=16):
+    if len(data) < chunked.PARALLEL_THRESHOLD:
+        chunk_results = [chunked.parse_packages_chunk(data.decode("utf-8", "replace"), release, component,
+                                                      architecture, deps is not None)]
+    else:
+        chunk_results = chunked.parse_packages(data, executor, parts, release, component,
+                                               architecture, deps is not None)
+    start = len(table)
+    for chunk_table, chunk_deps in chunk_results:
+        table.merge(chunk_table)
+        if deps is not None:
+            deps.merge(chunk_deps)
+    return len(table) - start
+
+# Stream the rows added since `start` to their release/component shard and drop them from memory
+def flush_to_shards(table, start, writer):
+    for row in range(start, len(table)):
+        record = table[row]
+        writer.write(record.to_dict(), key=(record.release, record.component))
+    table.truncate(start)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Parse Ubuntu Packages.gz files')
+    parser.add_argument('url', nargs='?', help='URL or local path of the Packages.gz file')
+    parser.add_argument('-i', '--index-file', help='Path to ubuntu_indexes.json to process multiple indexes')
+    parser.add_argument('-m', '--mirror', help='Path to a local apt mirror; indexes are discovered from its dists/ tree')
+    parser.add_argument('-o', '--output', default='ubuntu_packages.json', help='Output JSON filename')
+    parser.add_argument('--stdout', action='store_true', help='Output JSON to stdout instead of file')
+    parser.add_argument('--jsonl-dir', help='Stream gzip JSON Lines shards per release/component plus a manifest to this directory instead of one JSON file')
+    parser.add_argument('--validate', action='store_true', help='Validate URLs')
+    parser.add_argument('-c', '--cache-dir', default='index_cache', help='Directory for downloaded indexes (partial downloads are resumed)')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Number of concurrent downloads')
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(), help='Worker processes for parsing large indexes in parallel chunks')
+    parser.add_argument('-d', '--deps-output', help='Also write a dependency/reverse-dependency index to this JSON file')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not (args.index_file or args.mirror or args.url):
+        print("Error: Either a URL, an index file or a mirror path must be provided.")
+        return 1
+
+    all_packages = PackageTable()
+    shard_writer = ShardedWriter(args.jsonl_dir, metadata={"generator": "parser.py"}) if args.jsonl_dir else None
+    dependency_index = DependencyIndex() if args.deps_output else None
+    executor = chunked.make_executor(args.processes) if args.processes > 1 else None
+    parts = args.processes * 4
+
+    if args.index_file or args.mirror:
+        if args.mirror:
+            index_data = discover_indexes(args.mirror)
+        else:
+            with open(args.index_file, "r") as f:
+                index_data = json.load(f)
+
+        # Sources indexes have no binary package records (sources.py parses them)
+        index_data = [entry for entry in index_data if entry.get('architecture') != "source"]
+        entries, failures = download_all(index_data, args.cache_dir, args.jobs)
+        for entry in entries:
+            print(f"Processing: {entry['index_url']}")
+            arch = entry.get('architecture', '').replace('binary-', '') or None
+            process_packages_gz(entry['local_path'], entry['release'], entry.get('component', 'main'), all_packages, arch, dependency_index, executor, parts)
+            if shard_writer is not None:
+                flush_to_shards(all_packages, 0, shard_writer)
+        for url, error in failures.items():
+            print(f"Failed to fetch {url}: {error}")
 
-all_packages = []
+    else:
+        process_packages_gz(args.url, "manual", "main", all_packages, deps=dependency_index, executor=executor, parts=parts)
+        if shard_writer is not None:
+            flush_to_shards(all_packages, 0, shard_writer)
 
-if args.index_file:
-    with open(args.index_file, "r") as f:
-        index_data = json.load(f)
-    
-    for entry in index_data:
-        print(f"Processing: {entry['index_url']}")
-        try:
-            all_packages.extend(process_packages_gz(entry['index_url'], entry['release']))
-        except requests.RequestException as e:
-            print(f"Failed to fetch {entry['index_url']}: {e}")
+    if executor is not None:
+        executor.shutdown()
 
-elif args.url:
-    all_packages = process_packages_gz(args.url, "manual")
-else:
-    print("Error: Either a URL or an index file must be provided.")
-    sys.exit(1)
+    # Output JSON
+    if shard_writer is not None:
+        manifest = shard_writer.close()
+        print(f"{manifest['total_count']} packages written to {len(manifest['shards'])} shards in {args.jsonl_dir}")
+    elif args.stdout:
+        all_packages.dump_json(sys.stdout)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            all_packages.dump_json(f)
+        print(f"Data successfully saved to {args.output}")
 
-# Output JSON
-if args.stdout:
-    print(json.dumps(all_packages, indent=2))
-else:
-    with open(args.output, "w") as f:
-        json.dump(all_packages, f, indent=2)
-    print(f"Data successfully saved to {args.output}")
+    if dependency_index is not None:
+        dependency_index.save(args.deps_output)
+        print(f"Dependency index saved to {args.deps_output}")
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 import argparse
+import functools
 import requests
 import re
-import apt
 import os
+import sys
 import time
 
+from httpclient import default_client
+
 # List of lib? exceptions that use full "lib?" prefix
 LIB_EXCEPTIONS = {
     "lib+", "lib0", "lib2", "lib3", "lib4", "lib6", "liba", "libb", "libc", "libd", "libe",
@@ -26,7 +29,7 @@ def find_package_component(package_name, package_version):
 
     for component in COMPONENTS:
         url = f"{base_url}/{component}/{first_letter}/{package_name}/{package_name}_{package_version}/copyright"
-        response = requests.head(url)
+        response = default_client().head(url)
         if response.status_code == 200:
             return component, url
     return None, None
@@ -38,7 +41,7 @@ def extract_spdx_license(file_path_or_url, is_local):
             with open(file_path_or_url, "r", encoding="utf-8") as f:
                 content = f.read()
         else:
-            response = requests.get(file_path_or_url, timeout=5)
+            response = default_client().get(file_path_or_url, timeout=5)
             if response.status_code != 200:
                 return ["Unknown"]
             content = response.text
@@ -90,13 +93,29 @@ def get_urls(package_name, package_version, method, local_base_path=None):
         "licenses": licenses
     }
 
+@functools.lru_cache(maxsize=None)
+def apt_cache():
+    import apt  # python3-apt is only needed for release/architecture data
+    return apt.Cache()
+
+def get_package_info(package_name, package_version):
+    """Return (version, releases, architectures) for a package from the local apt cache."""
+    cache = apt_cache()
+    if package_name not in cache:
+        return package_version, [], []
+    package = cache[package_name]
+    candidates = [v for v in package.versions if v.version == package_version] or list(package.versions)
+    releases = sorted({origin.archive for v in candidates for origin in v.origins if origin.archive})
+    architectures = sorted({v.architecture for v in candidates})
+    return package_version, releases, architectures
+
 def process_manifest(file_path_or_url, method, include_release_arch, local_base_path, output_file=None):
     """Process a Debian manifest file from a local file or URL and generate package info."""
     results = []
     
     # Handle URLs
     if file_path_or_url.startswith("http"):
-        response = requests.get(file_path_or_url)
+        response = default_client().get(file_path_or_url)
         if response.status_code != 200:
             print(f"Error: Unable to fetch manifest from {file_path_or_url}")
             return
@@ -162,7 +181,7 @@ def print_results(results, output_file):
             print(f"Supported Architectures: {res['architectures']}")
         print("\n" + "-"*60 + "\n")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Fetch Ubuntu package copyright and SPDX info.")
     
     input_group = parser.add_mutually_exclusive_group(required=True)
@@ -178,13 +197,14 @@ def main():
     parser.add_argument("--no-release-arch", action="store_true", help="Skip release and architecture data.")
     parser.add_argument("--output", help="Optional output file to save results.")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     method = "pool" if args.pool else "binary"
     include_release_arch = not args.no_release_arch
 
     if args.manifest:
         process_manifest(args.manifest, method, include_release_arch, args.local_path, args.output)
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Package Records
+Version: 1.0.0
+Description: Compact column-oriented storage for parsed Packages.gz stanzas.
+Repeated strings (release, component, architecture, section, maintainer, source) are interned
+into pools and stored as small integers; changelog/copyright URLs are derived on
+demand instead of being stored per package.
+"""
+
+import json
+import sys
+from array import array
+
+CHANGELOG_BASE = "https://changelogs.ubuntu.com/changelogs/pool"
+
+def pool_prefix(source):
+    """Directory prefix used by the pool layout: 'libf' for libfoo, 'b' for bash."""
+    return source[:4] if source.startswith("lib") else source[0]
+
+def changelog_base_url(source, version, component="main"):
+    version_clean = version.split(":")[-1]
+    return f"{CHANGELOG_BASE}/{component}/{pool_prefix(source)}/{source}/{source}_{version_clean}"
+
+def component_from_url(url, default="main"):
+    """Recover the component from a changelog/copyright URL in the pool layout."""
+    if url and url.startswith(CHANGELOG_BASE + "/"):
+        return url[len(CHANGELOG_BASE) + 1:].split("/", 1)[0]
+    return default
+
+class StringPool:
+    """Maps each distinct string to a small integer. Id 0 is reserved for None."""
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings = [None]
+        self.ids = {None: 0}
+
+    def intern(self, value):
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            value = sys.intern(value)
+            self.strings.append(value)
+            self.ids[value] = idx
+        return idx
+
+    def __getitem__(self, idx):
+        return self.strings[idx]
+
+    def __len__(self):
+        return len(self.strings) - 1
+
+class PackageRecord:
+    """Read-only view of one row of a PackageTable."""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    release = property(lambda self: self.table.releases[self.table.release_ids[self.row]])
+    component = property(lambda self: self.table.components[self.table.component_ids[self.row]])
+    architecture = property(lambda self: self.table.architectures[self.table.architecture_ids[self.row]])
+    package = property(lambda self: self.table.packages[self.row])
+    full_version = property(lambda self: self.table.versions[self.row])
+    source = property(lambda self: self.table.sources[self.table.source_ids[self.row]])
+    section = property(lambda self: self.table.sections[self.table.section_ids[self.row]])
+    maintainer = property(lambda self: self.table.maintainers[self.table.maintainer_ids[self.row]])
+
+    @property
+    def version(self):
+        return self.full_version.split(":")[-1]
+
+    @property
+    def size(self):
+        size = self.table.sizes[self.row]
+        return None if size < 0 else size
+
+    @property
+    def copyright(self):
+        return f"{changelog_base_url(self.source, self.full_version, self.component)}/copyright"
+
+    @property
+    def changelog(self):
+        return f"{changelog_base_url(self.source, self.full_version, self.component)}/changelog"
+
+    def to_dict(self):
+        """Render the row in the parsed_packages.json schema."""
+        pkg_dict = {"release": self.release, "package": self.package, "version": self.version,
+                    "source": self.source}
+        epoch, colon, _ = self.full_version.partition(":")
+        if colon:
+            pkg_dict["epoch"] = int(epoch)  # "version" leaves it out, as in the changelog URLs
+        if self.architecture is not None:
+            pkg_dict["architecture"] = self.architecture
+        if self.section is not None:
+            pkg_dict["section"] = self.section
+        if self.maintainer is not None:
+            pkg_dict["maintainer"] = self.maintainer
+        if self.size is not None:
+            pkg_dict["size"] = self.size
+        base_url = changelog_base_url(self.source, self.full_version, self.component)
+        pkg_dict["copyright"] = f"{base_url}/copyright"
+        pkg_dict["changelog"] = f"{base_url}/changelog"
+        return pkg_dict
+
+class PackageTable:
+    """Column store of binary package stanzas."""
+
+    def __init__(self):
+        self.releases = StringPool()
+        self.components = StringPool()
+        self.architectures = StringPool()
+        self.sources = StringPool()
+        self.sections = StringPool()
+        self.maintainers = StringPool()
+        self.release_ids = array("H")
+        self.component_ids = array("H")
+        self.architecture_ids = array("H")
+        self.source_ids = array("I")
+        self.section_ids = array("H")
+        self.maintainer_ids = array("I")
+        self.packages = []
+        self.versions = []
+        self.sizes = array("q")
+
+    def __len__(self):
+        return len(self.packages)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return PackageRecord(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield PackageRecord(self, row)
+
+    def append(self, release, component, package, version, source=None, section=None,
+               maintainer=None, size=None, architecture=None):
+        self.release_ids.append(self.releases.intern(release))
+        self.component_ids.append(self.components.intern(component))
+        self.architecture_ids.append(self.architectures.intern(architecture))
+        self.source_ids.append(self.sources.intern(source or package))
+        self.section_ids.append(self.sections.intern(section))
+        self.maintainer_ids.append(self.maintainers.intern(maintainer))
+        self.packages.append(sys.intern(package))
+        self.versions.append(version)
+        self.sizes.append(-1 if size is None else size)
+
+    def append_stanza(self, lines, release, component="main", architecture=None):
+        """
+        Parse the lines of one Packages stanza and append it. Returns False if skipped.
+        `architecture` is the index's architecture; the stanza's own field is only used
+        when it is not known, so 'all' packages are attributed to the index they came from.
+        """
+        package = version = source = section = maintainer = size = None
+        for line in lines:
+            if line.startswith("Package: "):
+                package = line[9:]
+            elif line.startswith("Version: "):
+                version = line[9:]
+            elif line.startswith("Source: "):
+                source = line[8:].split()[0]
+            elif line.startswith("Section: "):
+                section = line[9:]
+            elif line.startswith("Maintainer: "):
+                maintainer = line[12:]
+            elif line.startswith("Size: "):
+                size = int(line[6:])
+            elif line.startswith("Architecture: ") and architecture is None:
+                architecture = line[14:]
+
+        # Ensure 'package' field exists before setting default source
+        if package is None:
+            print(f"Skipping entry with missing 'Package' field: {lines[:2]}")
+            return False
+        if version is None:
+            return False
+        self.append(release, component, package, version, source, section, maintainer, size,
+                    architecture)
+        return True
+
+    def truncate(self, rows):
+        """Drop every row from index `rows` on, e.g. after a partially read index."""
+        for column in (self.release_ids, self.component_ids, self.architecture_ids,
+                       self.source_ids, self.section_ids,
+                       self.maintainer_ids, self.packages, self.versions, self.sizes):
+            del column[rows:]
+
+    def merge(self, other):
+        """Append all rows of another table in bulk, remapping its pool ids onto ours."""
+        for pool, ids, other_pool, other_ids in (
+                (self.releases, self.release_ids, other.releases, other.release_ids),
+                (self.components, self.component_ids, other.components, other.component_ids),
+                (self.architectures, self.architecture_ids, other.architectures, other.architecture_ids),
+                (self.sources, self.source_ids, other.sources, other.source_ids),
+                (self.sections, self.section_ids, other.sections, other.section_ids),
+                (self.maintainers, self.maintainer_ids, other.maintainers, other.maintainer_ids)):
+            remap = [pool.intern(value) for value in other_pool.strings]
+            ids.extend(remap[idx] for idx in other_ids)
+        self.packages.extend(sys.intern(name) for name in other.packages)
+        self.versions.extend(other.versions)
+        self.sizes.extend(other.sizes)
+
+    def extend(self, other):
+        """Append every row of another table."""
+        for record in other:
+            self.append(record.release, record.component, record.package, record.full_version,
+                        record.source, record.section, record.maintainer, record.size,
+                        record.architecture)
+
+    @classmethod
+    def from_dicts(cls, entries):
+        """Build a table from parsed_packages.json entries, recovering the component from the URL."""
+        table = cls()
+        for entry in entries:
+            component = component_from_url(entry.get("changelog"))
+            version = f"{entry['epoch']}:{entry['version']}" if entry.get("epoch") else entry["version"]
+            table.append(entry.get("release"), component, entry["package"], version,
+                         entry.get("source"), entry.get("section"), entry.get("maintainer"),
+                         entry.get("size"), entry.get("architecture"))
+        return table
+
+    def iter_dicts(self):
+        for record in self:
+            yield record.to_dict()
+
+    def dump_json(self, f, indent=2):
+        """Write the table as a JSON list one record at a time, without building the list."""
+        pad = " " * indent if indent else ""
+        f.write("[")
+        for row, pkg_dict in enumerate(self.iter_dicts()):
+            f.write(",\n" if row else "\n")
+            text = json.dumps(pkg_dict, indent=indent)
+            f.write(pad + text.replace("\n", "\n" + pad) if indent else text)
+        f.write("\n]" if len(self) else "]")
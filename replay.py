@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Ubuntu HTTP Fixture Recorder/Replayer
+Version: 1.0.0
+Description: A local stand-in for archive.ubuntu.com, esm.ubuntu.com,
+changelogs.ubuntu.com and the other hosts the tools talk to. With
+COPR_FIXTURE_SERVER set, httpclient sends every request to this server
+instead (the original URL becomes the path, e.g.
+/https/archive.ubuntu.com/ubuntu/dists/). In --record mode misses are fetched
+upstream and stored; otherwise the archive is replayed with optional simulated
+latency and bandwidth, so runs are reproducible and benchmarkable offline.
+
+Archive layout: index.jsonl (one interaction per line, later lines win) and
+objects/<sha256[:2]>/<sha256>, each body stored once, gzip-compressed when that
+makes it smaller.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+SCRIPT_VERSION = "1.0.0"
+INDEX = "index.jsonl"
+KEPT_HEADERS = ("Content-Type", "Last-Modified", "ETag", "Retry-After", "Location")
+WRITE_CHUNK = 16 << 10
+
+def original_url(path):
+    """'/https/archive.ubuntu.com/ubuntu/dists/?x=1' -> 'https://archive.ubuntu.com/ubuntu/dists/?x=1'"""
+    scheme, _, rest = path.lstrip("/").partition("/")
+    return f"{scheme}://{rest}"
+
+def parse_rate(value):
+    """'5M' -> 5242880 bytes per second."""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+class FixtureArchive:
+    """Content-addressed store of recorded HTTP interactions."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        index = os.path.join(path, INDEX)
+        if os.path.exists(index):
+            with open(index, "r") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[(entry["method"], entry["url"])] = entry
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    def get(self, method, url):
+        return self.entries.get((method, url)) or (self.entries.get(("GET", url)) if method == "HEAD" else None)
+
+    def body(self, entry):
+        if "body" in entry:  # not archived, see FixtureHandler._fetch_upstream
+            return entry["body"]
+        with open(self._object_path(entry["sha256"]), "rb") as f:
+            data = f.read()
+        return gzip.decompress(data) if entry.get("compressed") else data
+
+    def add(self, method, url, status, headers, body, elapsed):
+        digest = hashlib.sha256(body).hexdigest()
+        target = self._object_path(digest)
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        use_gzip = len(compressed) < len(body) * 0.9
+        entry = {
+            "method": method,
+            "url": url,
+            "status": status,
+            "headers": {key: headers[key] for key in KEPT_HEADERS if key in headers},
+            "sha256": digest,
+            "size": len(body),
+            "compressed": use_gzip,
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time()
+        }
+        with self.lock:
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target + ".tmp", "wb") as f:
+                    f.write(compressed if use_gzip else body)
+                os.replace(target + ".tmp", target)
+            elif self.entries.get((method, url), {}).get("sha256") == digest:
+                return self.entries[(method, url)]
+            with open(os.path.join(self.path, INDEX), "a") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.entries[(method, url)] = entry
+        return entry
+
+    def stats(self):
+        digests = {entry["sha256"] for entry in self.entries.values()}
+        stored = sum(os.path.getsize(self._object_path(d)) for d in digests if os.path.exists(self._object_path(d)))
+        return {
+            "interactions": len(self.entries),
+            "hosts": sorted({urlsplit(url).netloc for _, url in self.entries}),
+            "unique_bodies": len(digests),
+            "body_bytes": sum(entry["size"] for entry in self.entries.values()),
+            "stored_bytes": stored
+        }
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    archive = None
+    record = False
+    latency = {}       # host -> seconds; "" is the default
+    bandwidth = None   # bytes per second
+    upstream = None
+    server_version = f"copr-replay/{SCRIPT_VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _fetch_upstream(self, method, url):
+        start = time.monotonic()
+        method = "GET" if method == "HEAD" else method
+        response = self.upstream.request(method, url, timeout=(10, 60))
+        if response.status_code == 429 or response.status_code >= 500:
+            # Pass throttling and outages through without archiving them
+            return {"status": response.status_code, "body": response.content,
+                    "headers": {key: response.headers[key] for key in KEPT_HEADERS if key in response.headers}}
+        return self.archive.add(method, url, response.status_code, response.headers,
+                                response.content, time.monotonic() - start)
+
+    def _serve(self, send_body):
+        url = original_url(self.path)
+        method = self.command
+        entry = self.archive.get(method, url)
+        if entry is None and self.record:
+            try:
+                entry = self._fetch_upstream(method, url)
+            except requests.RequestException as e:
+                self.send_error(502, f"upstream failed: {e}")
+                return
+        if entry is None:
+            self.send_error(404, "not recorded")
+            return
+
+        host = urlsplit(url).netloc
+        delay = self.latency.get(host, self.latency.get("", 0.0))
+        if delay:
+            time.sleep(delay)
+        body = self.archive.body(entry)
+        status = entry["status"]
+        start = 0
+        byte_range = self.headers.get("Range", "")
+        if status == 200 and byte_range.startswith("bytes="):
+            start = int(byte_range[6:].split("-")[0] or 0)
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        self.send_response(status)
+        for key, value in entry["headers"].items():
+            self.send_header(key, value)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if send_body:
+            self._write(memoryview(body)[start:])
+
+    def _write(self, body):
+        if not self.bandwidth:
+            self.wfile.write(body)
+            return
+        started = time.monotonic()
+        sent = 0
+        for offset in range(0, len(body), WRITE_CHUNK):
+            chunk = body[offset:offset + WRITE_CHUNK]
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            ahead = sent / self.bandwidth - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_GET(self):
+        self._serve(True)
+
+    def do_HEAD(self):
+        self._serve(False)
+
+def parse_latency(values):
+    """['0.05', 'esm.ubuntu.com=0.2'] -> {'': 0.05, 'esm.ubuntu.com': 0.2}"""
+    latency = {}
+    for value in values or []:
+        host, sep, seconds = value.rpartition("=")
+        latency[host if sep else ""] = float(seconds)
+    return latency
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record and replay HTTP fixtures for offline runs')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='Run the stand-in server')
+    serve.add_argument('-a', '--archive', required=True, help='Fixture archive directory')
+    serve.add_argument('--record', action='store_true', help='Fetch and store requests missing from the archive')
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    serve.add_argument('--port', type=int, default=8700, help='Port to listen on')
+    serve.add_argument('--latency', action='append', metavar='[HOST=]SECONDS',
+                       help='Delay before each response, for all hosts or one original host; may be repeated')
+    serve.add_argument('--bandwidth', help='Per-response bandwidth limit, e.g. 500K or 5M (bytes/s)')
+    stats = sub.add_parser('stats', help='Summarize a fixture archive')
+    stats.add_argument('-a', '--archive', required=True, help='Fixture archive directory')
+    args = parser.parse_args(argv)
+
+    archive = FixtureArchive(args.archive)
+    if args.command == 'stats':
+        print(json.dumps(archive.stats(), indent=2))
+        return
+
+    FixtureHandler.archive = archive
+    FixtureHandler.record = args.record
+    FixtureHandler.latency = parse_latency(args.latency)
+    FixtureHandler.bandwidth = parse_rate(args.bandwidth) if args.bandwidth else None
+    FixtureHandler.upstream = requests.Session()
+
+    server = ThreadingHTTPServer((args.host, args.port), FixtureHandler)
+    server.daemon_threads = True
+    mode = "Recording into" if args.record else "Replaying"
+    print(f"✅ {mode} {args.archive} ({len(archive.entries)} interactions) on http://{args.host}:{args.port}")
+    print(f"   export COPR_FIXTURE_SERVER=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
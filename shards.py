@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Sharded JSON Lines Output
+Version: 1.0.0
+Description: Streams records to gzip-compressed JSON Lines files, one shard per
+key (e.g. release/component), and writes a manifest.json listing every shard with
+its record count, byte size and SHA256 so consumers can fetch only what they need.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+MANIFEST = "manifest.json"
+
+class _HashingFile:
+    """Write-through file wrapper that hashes and counts the bytes written."""
+
+    def __init__(self, path):
+        self.f = open(path, "wb")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def _safe(part):
+    return re.sub(r"[^A-Za-z0-9._+-]", "_", str(part)) or "_"
+
+class ShardedWriter:
+    """
+    Usage:
+        with ShardedWriter("out", key_fields=("release", "component")) as writer:
+            writer.write(record)  # shard chosen from record["release"], record["component"]
+    """
+
+    def __init__(self, output_dir, key_fields=("release", "component"), metadata=None):
+        self.output_dir = output_dir
+        self.key_fields = key_fields
+        self.metadata = metadata or {}
+        self.shards = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self, key):
+        relpath = os.path.join(*(_safe(part) for part in key)) + ".jsonl.gz"
+        path = os.path.join(self.output_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw = _HashingFile(path)
+        shard = {
+            "key": dict(zip(self.key_fields, key)),
+            "path": relpath.replace(os.sep, "/"),
+            "raw": raw,
+            "stream": gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0),
+            "count": 0
+        }
+        self.shards[key] = shard
+        return shard
+
+    def write(self, record, key=None):
+        """Append one record; the shard key defaults to the record's key_fields values."""
+        if key is None:
+            key = tuple(record.get(field) or "unknown" for field in self.key_fields)
+        shard = self.shards.get(key) or self._open(key)
+        shard["stream"].write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        shard["count"] += 1
+
+    def close(self):
+        entries = []
+        for shard in self.shards.values():
+            shard["stream"].close()
+            shard["raw"].close()
+            entries.append({
+                **shard["key"],
+                "path": shard["path"],
+                "count": shard["count"],
+                "bytes": shard["raw"].size,
+                "sha256": shard["raw"].sha256.hexdigest()
+            })
+        manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "format": "jsonl.gz",
+            "key_fields": list(self.key_fields),
+            **self.metadata,
+            "total_count": sum(e["count"] for e in entries),
+            "shards": sorted(entries, key=lambda e: e["path"])
+        }
+        with open(os.path.join(self.output_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_shards(manifest_dir, **filters):
+    """Yield records from the shards whose key matches every given filter."""
+    with open(os.path.join(manifest_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    for shard in manifest["shards"]:
+        if all(shard.get(field) == value for field, value in filters.items()):
+            with gzip.open(os.path.join(manifest_dir, shard["path"]), "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+_WHITESPACE = re.compile(r"\s*")
+_NUMBER_TAIL = ".eE+-0123456789"  # characters that can continue a JSON number
+
+def read_json_list(path, chunk_size=1 << 20):
+    """
+    Yield the items of a JSON list file one at a time (e.g. parser.py's single-file
+    output), holding only the current chunk and item in memory rather than the list.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+        started = expect_item = False
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer) and not eof:
+                chunk = f.read(chunk_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            char = buffer[pos:pos + 1]
+            if not started:
+                if char != "[":
+                    raise ValueError(f"{path} is not a JSON list")
+                started = expect_item = True
+                pos += 1
+            elif char == "]" and expect_item is not None:
+                return
+            elif char == "," and expect_item is False:
+                expect_item = None  # an item must follow a comma
+                pos += 1
+            elif not char:
+                raise ValueError(f"{path} ends inside the JSON list")
+            elif expect_item is False or char in ",]":
+                raise ValueError(f"{path} is not a valid JSON list")
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    end = None
+                if end is None or (not eof and (end == len(buffer) or (
+                        isinstance(item, (int, float)) and buffer[end] in _NUMBER_TAIL))):
+                    # Cut off by the chunk boundary; a number split after its
+                    # digits, "." or exponent may also look complete: read on
+                    if eof:
+                        raise ValueError(f"{path} is not a valid JSON list")
+                    chunk = f.read(chunk_size)
+                    buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                    continue
+                yield item
+                pos = end
+                expect_item = False
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Ubuntu Mirror Size Index
+Version: 1.0.0
+Description: Persists one row per pool file occurrence (file hash, size, suite,
+component, architecture) and answers "what-if" mirror sizing queries from it.
+
+Every suite/component/architecture combination is a bit position. Each unique
+file gets the bitmap of combinations it appears in, and files sharing a bitmap
+are pre-aggregated, so a query only ORs its selection into one mask and sums the
+aggregates whose bitmap intersects it - thousands of groups rather than millions
+of files.
+
+File layout: one JSON header line, then the row arrays (keys Q, sizes Q, combo
+ids H) in native byte order.
+"""
+
+import json
+import sys
+from array import array
+
+from dedup import file_key
+
+FORMAT = "copr-sizeindex"
+VERSION = 1
+
+class SizeIndexBuilder:
+    """Collects file occurrences while sizer.py walks the indexes."""
+
+    def __init__(self):
+        self.combos = []
+        self.combo_ids = {}
+        self.current = None
+        self.start = 0      # first row of the current selection
+        self.failed = []    # combo ids whose index could not be read
+        self.keys = array("Q")
+        self.sizes = array("Q")
+        self.combo_col = array("H")
+        self.files = {}  # key -> [combo bitmap, size]
+
+    def select(self, suite, component, architecture):
+        """Set the suite/component/architecture of the rows added next."""
+        combo = (suite, component, architecture)
+        if combo not in self.combo_ids:
+            self.combo_ids[combo] = len(self.combos)
+            self.combos.append(combo)
+        self.current = self.combo_ids[combo]
+        self.start = len(self.keys)
+
+    def discard(self):
+        """Drop the rows added since select(): the index failed part-way, so it
+        neither counts as an index nor contributes files to any query."""
+        bit = 1 << self.current
+        for key in self.keys[self.start:]:
+            entry = self.files[key]
+            entry[0] &= ~bit
+            if not entry[0]:
+                del self.files[key]
+        del self.keys[self.start:]
+        del self.sizes[self.start:]
+        del self.combo_col[self.start:]
+        if self.current not in self.failed:
+            self.failed.append(self.current)
+
+    def add(self, size, filename=None, sha256=None, archive=None):
+        key = file_key(filename, sha256, archive)
+        if key is None:
+            return
+        self.keys.append(key)
+        self.sizes.append(size)
+        self.combo_col.append(self.current)
+        bit = 1 << self.current
+        entry = self.files.get(key)
+        if entry is None:
+            self.files[key] = [bit, size]
+        else:
+            entry[0] |= bit
+
+    def save(self, path):
+        combo_totals = [[0, 0] for _ in self.combos]
+        for combo, size in zip(self.combo_col, self.sizes):
+            combo_totals[combo][0] += 1
+            combo_totals[combo][1] += size
+        groups = {}
+        for bitmap, size in self.files.values():
+            group = groups.setdefault(bitmap, [0, 0])
+            group[0] += 1
+            group[1] += size
+        header = {
+            "format": FORMAT,
+            "version": VERSION,
+            "byteorder": sys.byteorder,
+            "combos": self.combos,
+            "combo_totals": combo_totals,
+            "failed": self.failed,
+            "groups": [[format(bitmap, "x"), files, size] for bitmap, (files, size) in groups.items()],
+            "rows": len(self.keys)
+        }
+        with open(path, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+            for column in (self.keys, self.sizes, self.combo_col):
+                column.tofile(f)
+
+class SizeIndex:
+    """Read side: loads the header (not the rows) and answers sizing queries."""
+
+    def __init__(self, header):
+        self.combos = [tuple(combo) for combo in header["combos"]]
+        self.combo_totals = header["combo_totals"]
+        self.groups = [(int(bitmap, 16), files, size) for bitmap, files, size in header["groups"]]
+        self.row_count = header["rows"]
+        self.failed = header.get("failed", [])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a size index")
+        return cls(header)
+
+    def mask(self, suites=None, components=None, architectures=None):
+        arches = None
+        if architectures:
+            arches = set(architectures) | {f"binary-{arch}" for arch in architectures}
+        mask = 0
+        for bit, (suite, component, arch) in enumerate(self.combos):
+            if ((not suites or suite in suites) and (not components or component in components)
+                    and (not arches or arch in arches)):
+                mask |= 1 << bit
+        return mask
+
+    def query(self, suites=None, components=None, architectures=None):
+        mask = self.mask(suites, components, architectures)
+        failed = [self.combos[bit] for bit in self.failed if mask >> bit & 1]
+        for bit in self.failed:
+            mask &= ~(1 << bit)
+        naive_files = naive_size = 0
+        for bit, (files, size) in enumerate(self.combo_totals):
+            if mask >> bit & 1:
+                naive_files += files
+                naive_size += size
+        unique_files = unique_size = 0
+        for bitmap, files, size in self.groups:
+            if bitmap & mask:
+                unique_files += files
+                unique_size += size
+        return {
+            "selection": {"suites": suites or "all", "components": components or "all",
+                          "architectures": architectures or "all"},
+            "indexes": bin(mask).count("1"),
+            "naive": {"files": naive_files, "size": naive_size},
+            "unique": {"files": unique_files, "size": unique_size},
+            "duplicate_size": naive_size - unique_size,
+            "failed_indexes": ["/".join(combo) for combo in failed]
+        }
+
+    @staticmethod
+    def read_rows(path):
+        """Load the per-file rows: (keys, sizes, combo ids) arrays."""
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            columns = []
+            for typecode in ("Q", "Q", "H"):
+                column = array(typecode)
+                column.fromfile(f, header["rows"])
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                columns.append(column)
+        return tuple(columns)
@@ -2,126 +2,226 @@
 # Ubuntu Repository Sizer
 # Revision: 1.0.3
 
-import gzip
 import requests
 import json
+import os
 import sys
-from io import BytesIO
 import argparse
-
-# Argument parsing
-parser = argparse.ArgumentParser(description='Ubuntu Repository Sizer')
-parser.add_argument('-i', '--index-file', required=True, help='Path to ubuntu_indexes.json')
-parser.add_argument('-o', '--output', default='ubuntu_reposize.json', help='Output JSON filename')
-args = parser.parse_args()
+from mirror import open_index, iter_stanzas, discover_indexes
+from downloader import download_all
+from dedup import UniqueSizer
+from sizeindex import SizeIndexBuilder, SizeIndex
+import sources
+import chunked
 
 # Function to process a Packages.gz file
-def process_packages_gz(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        if len(response.content) == 0:
-            print(f"Skipping empty file: {url}")
-            return 0, 0
-        
-        with gzip.open(BytesIO(response.content), 'rt', encoding='utf-8') as f:
-            packages_data = f.read()
-        
-        if not packages_data.strip():
-            print(f"Skipping zero-byte or unreadable file: {url}")
-            return 0, 0
-    except requests.RequestException as e:
-        print(f"Skipping due to download error: {url} - {e}")
-        return 0, 0
-    
-    packages = packages_data.strip().split("\n\n")
+def process_packages_gz(url, collectors=(), archive=None):
     total_packages = 0
     total_size = 0
+    rows = []  # handed to the collectors only once the whole index has been read
+    try:
+        with open_index(url) as stream:
+            for pkg in iter_stanzas(stream):
+                total_packages += 1
+                size = 0
+                filename = sha256 = None
+                for line in pkg:
+                    if line.startswith("Size: "):
+                        size = int(line.split("Size: ")[1])
+                    elif line.startswith("Filename: "):
+                        filename = line[10:]
+                    elif line.startswith("SHA256: "):
+                        sha256 = line[8:]
+                total_size += size
+                rows.append((size, filename, sha256))
+    except (requests.RequestException, OSError, EOFError) as e:
+        print(f"Failed to read index: {url} - {e}")
+        return None
     
-    for pkg in packages:
-        total_packages += 1
-        for line in pkg.split("\n"):
-            if line.startswith("Size: "):
-                total_size += int(line.split("Size: ")[1])
-    
+    for size, filename, sha256 in rows:
+        for collector in collectors:
+            collector.add(size, filename, sha256, archive)
+    if not total_packages:
+        print(f"Skipping zero-byte or unreadable file: {url}")
     return total_packages, total_size
 
-# Function to process a Sources.gz file
-def process_sources_gz(url):
+# Function to process a Sources.gz file; returns (projects, size, records)
+def process_sources_gz(url, collectors=(), executor=None, parts=16, archive=None):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        if len(response.content) == 0:
-            print(f"Skipping empty file: {url}")
-            return 0, 0
-        
-        with gzip.open(BytesIO(response.content), 'rt', encoding='utf-8') as f:
-            sources_data = f.read()
-        
-        if not sources_data.strip():
-            print(f"Skipping zero-byte or unreadable file: {url}")
-            return 0, 0
-    except requests.RequestException as e:
-        print(f"Skipping due to download error: {url} - {e}")
-        return 0, 0
+        records = sources.parse_sources(url, executor, parts)
+    except (requests.RequestException, OSError, EOFError) as e:
+        print(f"Failed to read index: {url} - {e}")
+        return None
     
-    sources = sources_data.strip().split("\n\n")
-    total_projects = 0
+    if not records:
+        print(f"Skipping zero-byte or unreadable file: {url}")
     total_source_size = 0
-    
-    for src in sources:
-        total_projects += 1
-        in_files_section = False
-        
-        for line in src.split("\n"):
-            if line.startswith("Files:"):
-                in_files_section = True
-                continue
-            if in_files_section and line.strip():
-                parts = line.split()
-                if len(parts) >= 3:
-                    total_source_size += int(parts[1])
-            elif in_files_section and not line.strip():
-                break  # End of the Files section
-    
-    return total_projects, total_source_size
+    for source, version, directory, files, binaries in records:
+        for name, size, sha256 in files:
+            total_source_size += size
+            for collector in collectors:
+                collector.add(size, f"{directory}/{name}", sha256, archive)
+    return len(records), total_source_size, records
 
-# Read the index file
-with open(args.index_file, "r") as f:
-    index_data = json.load(f)
+# Restrict to the selected suites/components/architectures
+def selected(entry, suites=None, components=None, arches=None):
+    arch = entry['architecture'].replace('binary-', '')
+    return ((not suites or entry['release'] in suites)
+            and (not components or entry['component'] in components)
+            and (not arches or arch in arches or entry['architecture'] in arches))
 
-repo_size_data = {}
+# Mark a suite/component/architecture whose index could not be read, rather than counting it as empty
+def mark_failed(stats, url, error):
+    stats["failed"] = True
+    stats.setdefault("errors", []).append({"index_url": url, "error": error})
 
-for entry in index_data:
-    suite = entry['release']
-    component = entry['component']
-    architecture = entry['architecture']
-    index_url = entry['index_url']
-    
-    print(f"Processing: {index_url}")
-    
-    if architecture == "source":
-        projects, size = process_sources_gz(index_url)
-        repo_size_data.setdefault(suite, {}).setdefault(component, {}).setdefault("source", {
-            "projects": 0,
-            "source_size": 0
-        })
-        repo_size_data[suite][component]["source"]["projects"] += projects
-        repo_size_data[suite][component]["source"]["source_size"] += size
+def size_bucket(repo_size_data, suite, component, architecture):
+    fields = ("projects", "source_size") if architecture == "source" else ("packages", "total_size")
+    return repo_size_data.setdefault(suite, {}).setdefault(component, {}).setdefault(
+        architecture, dict.fromkeys(fields, 0))
+
+# Update the totals of one suite/component/architecture from a delta.py delta instead of re-reading its index
+def apply_delta(repo_size_data, delta):
+    count_field, size_field = ("projects", "source_size") if delta["kind"] == "sources" else ("packages", "total_size")
+    stats = size_bucket(repo_size_data, delta["release"], delta["component"], delta["architecture"])
+    failed = stats.pop("failed", False)
+    stats.pop("errors", None)
+    if delta["initial"] or failed or count_field not in stats:
+        # No trustworthy previous totals to adjust: take the index's own totals
+        stats[count_field] = delta["count"]
+        stats[size_field] = delta["size"]
+        return stats
+    stats[count_field] += len(delta["added"]) - len(delta["removed"])
+    stats[size_field] += (sum(record["size"] or 0 for record in delta["added"])
+                          - sum(record["size"] or 0 for record in delta["removed"])
+                          + sum((new["size"] or 0) - (old["size"] or 0) for old, new in delta["changed"]))
+    return stats
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Ubuntu Repository Sizer')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('-i', '--index-file', help='Path to ubuntu_indexes.json')
+    source_group.add_argument('-m', '--mirror', help='Path to a local apt mirror; indexes are discovered from its dists/ tree')
+    source_group.add_argument('-q', '--query-index', help='Answer a sizing query for the --suite/--component/--arch selection from a saved size index, without downloading')
+    parser.add_argument('-o', '--output', default='ubuntu_reposize.json', help='Output JSON filename')
+    parser.add_argument('-c', '--cache-dir', default='index_cache', help='Directory for downloaded indexes (partial downloads are resumed)')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Number of concurrent downloads')
+    parser.add_argument('-s', '--suite', action='append', help='Only size this suite (repeatable)')
+    parser.add_argument('--component', action='append', help='Only size this component (repeatable)')
+    parser.add_argument('-a', '--arch', action='append', help='Only size this architecture, e.g. amd64 or source (repeatable)')
+    parser.add_argument('-u', '--unique-output', help='Also write naive vs. deduplicated (unique pool file) totals for the selection to this JSON file')
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count(), help='Worker processes for parsing large Sources indexes')
+    parser.add_argument('--sources-output', help='Also write per-source records (version, directory, files, binaries) to this JSON file')
+    parser.add_argument('-x', '--size-index', help='Also save a per-file size index for later --query-index runs')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Query mode: answer from a saved size index and stop
+    if args.query_index:
+        result = SizeIndex.load(args.query_index).query(args.suite, args.component, args.arch)
+        print(json.dumps(result, indent=2))
+        return 0
+
+    # Read the index file, or discover the indexes of a local mirror
+    if args.mirror:
+        index_data = discover_indexes(args.mirror)
     else:
-        packages, size = process_packages_gz(index_url)
-        repo_size_data.setdefault(suite, {}).setdefault(component, {}).setdefault(architecture, {
-            "packages": 0,
-            "total_size": 0
-        })
-        repo_size_data[suite][component][architecture]["packages"] += packages
-        repo_size_data[suite][component][architecture]["total_size"] += size
+        with open(args.index_file, "r") as f:
+            index_data = json.load(f)
+
+    index_data = [entry for entry in index_data if selected(entry, args.suite, args.component, args.arch)]
+    unique = UniqueSizer() if args.unique_output else None
+    size_index = SizeIndexBuilder() if args.size_index else None
+    collectors = [c for c in (unique, size_index) if c is not None]
+
+    repo_size_data = {}
+
+    entries, failures = download_all(index_data, args.cache_dir, args.jobs)
+    executor = chunked.make_executor(args.processes) if args.processes > 1 else None
+    source_records = {}
+    read_failures = {}
+
+    for entry in entries:
+        suite = entry['release']
+        component = entry['component']
+        architecture = entry['architecture']
+        index_url = entry['index_url']
+
+        print(f"Processing: {index_url}")
+        stats = size_bucket(repo_size_data, suite, component, architecture)
+        if size_index is not None:
+            size_index.select(suite, component, architecture)
+
+        if architecture == "source":
+            result = process_sources_gz(entry['local_path'], collectors, executor, args.processes * 4,
+                                        entry.get('archive_url'))
+            if result is None:
+                mark_failed(stats, index_url, "unreadable index")
+                read_failures[index_url] = "unreadable index"
+                if size_index is not None:
+                    size_index.discard()
+                continue
+            projects, size, records = result
+            if args.sources_output:
+                source_records.setdefault(suite, {}).setdefault(component, []).extend(
+                    sources.to_dict(record) for record in records)
+            stats["projects"] += projects
+            stats["source_size"] += size
+        else:
+            result = process_packages_gz(entry['local_path'], collectors, entry.get('archive_url'))
+            if result is None:
+                mark_failed(stats, index_url, "unreadable index")
+                read_failures[index_url] = "unreadable index"
+                if size_index is not None:
+                    size_index.discard()
+                continue
+            packages, size = result
+            stats["packages"] += packages
+            stats["total_size"] += size
+
+    if executor is not None:
+        executor.shutdown()
+
+    for entry in index_data:
+        if entry['index_url'] in failures:
+            stats = size_bucket(repo_size_data, entry['release'], entry['component'], entry['architecture'])
+            mark_failed(stats, entry['index_url'], failures[entry['index_url']])
+            if size_index is not None:
+                size_index.select(entry['release'], entry['component'], entry['architecture'])
+                size_index.discard()
+
+    if failures:
+        print(f"{len(failures)} indexes failed to download and are marked as failed in the output")
+
+    # Save the result to file
+    with open(args.output, "w") as f:
+        json.dump(repo_size_data, f, indent=2)
+
+    print(f"Repository size data saved to {args.output}")
+
+    if unique is not None:
+        unique_report = {
+            "selection": {"suites": args.suite or "all", "components": args.component or "all",
+                          "architectures": args.arch or "all"},
+            **unique.report(),
+            "failed_indexes": sorted(set(failures) | set(read_failures))
+        }
+        with open(args.unique_output, "w") as f:
+            json.dump(unique_report, f, indent=2)
+        print(f"Naive size: {unique.naive_size} bytes, unique on-disk size: {unique.unique_size} bytes")
+        print(f"Deduplicated size data saved to {args.unique_output}")
 
-# Save the result to file
-with open(args.output, "w") as f:
-    json.dump(repo_size_data, f, indent=2)
+    if args.sources_output:
+        with open(args.sources_output, "w") as f:
+            json.dump(source_records, f, indent=2)
+        print(f"Source records saved to {args.sources_output}")
 
-print(f"Repository size data saved to {args.output}")
+    if size_index is not None:
+        size_index.save(args.size_index)
+        print(f"Size index saved to {args.size_index}")
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,11 @@
 # Revision: 1.0.3
 
 import json
+import sys
 import argparse
 
+from debversion import compare
+
 def load_json(filename):
     with open(filename, 'r') as f:
         return json.load(f)
@@ -35,11 +38,17 @@ def compare_repos(ga_file, updates_file, output_file):
                 removed_packages = set(ga_info.get("packages", [])) - set(updates_info.get("packages", []))
                 
                 version_changes = {}
+                ga_versions = ga_info.get("versions", {})
                 for pkg, ver in updates_info.get("versions", {}).items():
-                    if pkg in ga_info.get("versions", {}) and ga_info["versions"][pkg] != ver:
+                    old = ga_versions.get(pkg)
+                    if old is None or old == ver:
+                        continue
+                    order = compare(old, ver)
+                    if order:
                         version_changes[pkg] = {
-                            "old": ga_info["versions"][pkg],
-                            "new": ver
+                            "old": old,
+                            "new": ver,
+                            "direction": "upgrade" if order < 0 else "downgrade"
                         }
                 
                 report[release][component][arch] = {
@@ -53,12 +62,37 @@ def compare_repos(ga_file, updates_file, output_file):
     
     print(f"Comparison report saved to {output_file}")
 
-if __name__ == "__main__":
+# Build the same report from delta.py deltas, i.e. the changes between two fetches of each index
+def delta_report(deltas):
+    report = {}
+    for delta in deltas:
+        if delta["initial"]:
+            continue  # no previous fetch to compare against
+        arch_report = report.setdefault(delta["release"], {}).setdefault(delta["component"], {}).setdefault(
+            delta["architecture"], {"new_packages": [], "removed_packages": [], "version_changes": {}})
+        arch_report["new_packages"].extend(record["package"] for record in delta["added"])
+        arch_report["removed_packages"].extend(record["package"] for record in delta["removed"])
+        for old, new in delta["changed"]:
+            order = compare(old["version"], new["version"])
+            if order:
+                arch_report["version_changes"][new["package"]] = {
+                    "old": old["version"],
+                    "new": new["version"],
+                    "direction": "upgrade" if order < 0 else "downgrade"
+                }
+    return report
+
+def build_parser():
     parser = argparse.ArgumentParser(description='Compare GA and Updates repo states')
     parser.add_argument('-g', '--ga', required=True, help='Path to GA JSON file')
     parser.add_argument('-u', '--updates', required=True, help='Path to Updates JSON file')
     parser.add_argument('-o', '--output', default='repo_growth_report.json', help='Output report JSON file')
-    
-    args = parser.parse_args()
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
     compare_repos(args.ga, args.updates, args.output)
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())